@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+#
+# best.py - Select the best hsps of a blast record
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+
+from __future__ import division
+import heapq
+
+
+def _largest_first(value):
+    """Sort key of a value, the largest first and None last. The tabular input leaves the values
+    of the missing fields None."""
+    if value is None:
+        return (1, 0)
+    return (0, -value)
+
+
+def _identity(hsp):
+    if hsp.identities is None or not hsp.align_length:
+        return None
+    return hsp.identities / hsp.align_length
+
+
+def _coverage(record, hsp):
+    if not record.query_length:
+        return None
+    return (abs(hsp.query_end - hsp.query_start) + 1) / record.query_length
+
+
+# Sort keys of the hsps, the smallest is the best. Ties are broken by the order of the hsps.
+CRITERIA = {
+    'evalue': lambda record, alignment, hsp: (hsp.expect,
+                                              _largest_first(_identity(hsp)),
+                                              _largest_first(hsp.align_length)),
+    'bitscore': lambda record, alignment, hsp: (_largest_first(hsp.bits),
+                                                hsp.expect),
+    'identity': lambda record, alignment, hsp: (_largest_first(_identity(hsp)),
+                                                hsp.expect),
+    'coverage': lambda record, alignment, hsp: (_largest_first(_coverage(record, hsp)),
+                                                hsp.expect),
+}
+
+
+def _candidates(record, key, ev_thresh):
+    order = 0
+
+    for alignment in record.alignments:
+        for hsp in alignment.hsps:
+            if ev_thresh is None or hsp.expect <= ev_thresh:
+                yield key(record, alignment, hsp), order, alignment, hsp
+                order += 1
+
+
+def top_hsps(record, k=1, criterion='evalue', ev_thresh=None):
+    """Return the k best hsps of the record as a list of (alignment, hsps), ordered by the first
+    selected hsp of each alignment.
+
+    Only a heap of k items is kept, so the cost is O(n log k) for n hsps.
+    """
+    key = CRITERIA[criterion]
+    alignments = []
+    hsps = {}
+
+    for item in heapq.nsmallest(k, _candidates(record, key, ev_thresh)):
+        alignment, hsp = item[2], item[3]
+
+        if id(alignment) not in hsps:
+            hsps[id(alignment)] = []
+            alignments.append((alignment, hsps[id(alignment)]))
+
+        hsps[id(alignment)].append(hsp)
+
+    return alignments
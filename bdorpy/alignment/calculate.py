@@ -8,6 +8,33 @@
 #
 # Author: Jian-Long Huang (jianlong@ntu.edu.tw)
 # Created: 2013.2.8
+#
+# The batch functions take arrays of (start, end) intervals, a NumPy array of shape (n, 2) or a
+# list of tuples, and require NumPy. The positions are inclusive like the hsp positions of blast.
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _check_numpy():
+    if numpy is None:
+        raise ImportError('The NumPy module is required by the batch interval functions.')
+
+
+def as_intervals(positions):
+    """Return the positions as an int64 array of shape (n, 2)."""
+    _check_numpy()
+    intervals = numpy.asarray(positions, dtype=numpy.int64)
+
+    if intervals.size == 0:
+        return intervals.reshape(0, 2)
+
+    if intervals.ndim != 2 or intervals.shape[1] != 2:
+        raise ValueError('Intervals must be an array of (start, end), got shape ' + str(intervals.shape))
+
+    return intervals
 
 
 def get_overlap(first_position_tuple, second_position_tuple):
@@ -38,3 +65,116 @@ def get_non_overlap(first_position_tuple, second_position_tuple):
         return second_start, first_end
     else:
         return None
+
+
+def get_non_overlap_chain(positions, ranks):
+    """Return the indexes of the non-overlapping chain of positions, in the order of the chain.
+
+    The positions are swept by start position (ties keep the input order). A position that does not
+    overlap the span of the chain is appended to it, otherwise the one of the position and the last
+    position of the chain with the smaller rank is kept.
+    """
+    order = sorted(range(len(positions)), key=lambda i: positions[i][0])
+    chain = []
+
+    for i in order:
+        if not chain:
+            chain.append(i)
+        elif get_non_overlap((positions[chain[0]][0], positions[chain[-1]][1]), positions[i]) is not None:
+            chain.append(i)
+        elif not ranks[chain[-1]] < ranks[i]:
+            chain[-1] = i
+
+    return chain
+
+
+def is_overlap(first_positions, second_positions):
+    """Return a boolean array of get_overlap(first, second) is not None for each pair."""
+    first = as_intervals(first_positions)
+    second = as_intervals(second_positions)
+    first_start, first_end = first[:, 0], first[:, 1]
+    second_start, second_end = second[:, 0], second[:, 1]
+
+    return (((first_start < second_start) & (second_start < first_end)) |
+            ((second_start < first_start) & (first_start < second_end)))
+
+
+def is_non_overlap(first_positions, second_positions):
+    """Return a boolean array of get_non_overlap(first, second) is not None for each pair."""
+    first = as_intervals(first_positions)
+    second = as_intervals(second_positions)
+
+    return (first[:, 1] < second[:, 0]) | (second[:, 1] < first[:, 0])
+
+
+def get_spans(first_positions, second_positions):
+    """Return the (start, end) spans of each pair, the smallest start and the largest end."""
+    first = as_intervals(first_positions)
+    second = as_intervals(second_positions)
+
+    return numpy.column_stack((numpy.minimum(first[:, 0], second[:, 0]),
+                               numpy.maximum(first[:, 1], second[:, 1])))
+
+
+def normalize(positions):
+    """Return the intervals with start <= end. Reversed intervals (minus strand) are swapped."""
+    intervals = as_intervals(positions)
+
+    return numpy.column_stack((intervals.min(axis=1), intervals.max(axis=1)))
+
+
+def merge_intervals(positions):
+    """Return the union of the intervals as sorted, disjoint intervals. Overlapping and adjacent
+    intervals are merged."""
+    intervals = normalize(positions)
+
+    if len(intervals) == 0:
+        return intervals
+
+    intervals = intervals[numpy.argsort(intervals[:, 0], kind='mergesort')]
+    ends = numpy.maximum.accumulate(intervals[:, 1])
+    # A new interval begins where the start is after the largest end so far
+    begins = numpy.empty(len(intervals), dtype=bool)
+    begins[0] = True
+    begins[1:] = intervals[1:, 0] > ends[:-1] + 1
+    first = numpy.flatnonzero(begins)
+    last = numpy.append(first[1:], len(intervals)) - 1
+
+    return numpy.column_stack((intervals[first, 0], ends[last]))
+
+
+def covered_length(positions):
+    """Return the number of positions covered by the union of the intervals."""
+    merged = merge_intervals(positions)
+
+    return int((merged[:, 1] - merged[:, 0] + 1).sum())
+
+
+def get_gaps(positions, start, end):
+    """Return the intervals of start..end that are not covered by the intervals."""
+    merged = merge_intervals(positions)
+    merged = merged[(merged[:, 1] >= start) & (merged[:, 0] <= end)]
+    gap_starts = numpy.append(start, merged[:, 1] + 1)
+    gap_ends = numpy.append(merged[:, 0] - 1, end)
+    found = gap_starts <= gap_ends
+
+    return numpy.column_stack((gap_starts[found], gap_ends[found]))
+
+
+def covers(positions, points):
+    """Return a boolean array of whether each point is in the union of the intervals."""
+    merged = merge_intervals(positions)
+    points = numpy.asarray(points, dtype=numpy.int64)
+    index = numpy.searchsorted(merged[:, 0], points, side='right') - 1
+    inside = index >= 0
+    inside[inside] = points[inside] <= merged[index[inside], 1]
+
+    return inside
+
+
+def is_contained(inner_positions, outer_positions):
+    """Return a boolean array of whether each inner interval lies within its outer interval."""
+    inner = normalize(inner_positions)
+    outer = normalize(outer_positions)
+
+    return (outer[:, 0] <= inner[:, 0]) & (inner[:, 1] <= outer[:, 1])
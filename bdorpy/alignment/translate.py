@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+#
+# translate.py - Translate nucleotide sequences with the standard genetic code
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# The translation is the same as Bio.Seq.translate() with the standard table (NCBI table 1):
+# * The IUPAC ambiguous codons are translated to the amino acid they all code for, B (D or N),
+#   Z (E or Q), J (I or L) or X. A codon that may be a stop codon is *, if all are stop codons,
+#   otherwise X. U is read as T, and the sequence is case-insensitive.
+# * '---' is translated to '-'. Other codons raise ValueError.
+# * The trailing partial codon is dropped.
+#
+# A frame is 1, 2 or 3 on the sequence, or -1, -2 or -3 on the reverse complement, and starts at
+# position abs(frame) - 1. With NumPy, the codons are translated with a lookup table in one array
+# operation per frame. Without NumPy, a dict of the same codons is used.
+
+import itertools
+from collections import OrderedDict
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BASES = 'TCAG'
+AMINO_ACIDS = 'FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG'
+AMBIGUOUS_BASES = {'A': 'A', 'C': 'C', 'G': 'G', 'T': 'T', 'U': 'T',
+                   'R': 'AG', 'Y': 'CT', 'S': 'CG', 'W': 'AT', 'K': 'GT', 'M': 'AC',
+                   'B': 'CGT', 'D': 'AGT', 'H': 'ACT', 'V': 'ACG', 'N': 'ACGT', 'X': 'ACGT'}
+# X is an ambiguous base, but a codon with X that may be a stop codon is invalid, as in Biopython
+STOP_AMBIGUOUS_BASES = 'ACGTURYSWKMBDHVN'
+AMBIGUOUS_AMINO_ACIDS = (('B', set('DN')), ('Z', set('EQ')), ('J', set('IL')))
+COMPLEMENT = dict(zip('ACGTURYSWKMBDHVNX-', 'TGCAAYRSWMKVHDBNX-'))
+
+CACHE_SIZE = 6000
+FRAMES = (1, 2, 3, -1, -2, -3)
+
+_letters = sorted(AMBIGUOUS_BASES) + ['-']
+
+
+def _codon_amino_acid(codon):
+    if codon == '---':
+        return '-'
+
+    if '-' in codon:
+        return None
+
+    amino_acids = set()
+
+    for bases in itertools.product(*[AMBIGUOUS_BASES[base] for base in codon]):
+        index = BASES.index(bases[0]) * 16 + BASES.index(bases[1]) * 4 + BASES.index(bases[2])
+        amino_acids.add(AMINO_ACIDS[index])
+
+    if len(amino_acids) == 1:
+        return amino_acids.pop()
+
+    if '*' in amino_acids:
+        if all(base in STOP_AMBIGUOUS_BASES for base in codon):
+            return 'X'
+        return None
+
+    for ambiguous, values in AMBIGUOUS_AMINO_ACIDS:
+        if amino_acids <= values:
+            return ambiguous
+
+    return 'X'
+
+
+def _build_codon_table():
+    table = {}
+
+    for codon in itertools.product(_letters, repeat=3):
+        amino_acid = _codon_amino_acid(''.join(codon))
+
+        if amino_acid is not None:
+            table[''.join(codon)] = amino_acid
+
+    return table
+
+CODON_TABLE = _build_codon_table()
+
+
+def _build_complement_table():
+    table = bytearray(range(256))
+
+    for base, complement in COMPLEMENT.items():
+        table[ord(base)] = ord(complement)
+        table[ord(base.lower())] = ord(complement.lower())
+
+    return bytes(table)
+
+_complement = _build_complement_table()
+
+if numpy is not None:
+    # Byte to letter code, len(_letters) for the other bytes
+    _codes = numpy.full(256, len(_letters), dtype=numpy.int32)
+
+    for i, letter in enumerate(_letters):
+        _codes[ord(letter)] = i
+        _codes[ord(letter.lower())] = i
+
+    _size = len(_letters) + 1
+    # Letter code to the code of its complement
+    _complement_codes = numpy.arange(_size, dtype=numpy.int32)
+
+    for base, complement in COMPLEMENT.items():
+        _complement_codes[_letters.index(base)] = _letters.index(complement)
+
+    # Codon code to amino acid byte, 0 for the invalid codons
+    _table = numpy.zeros(_size ** 3, dtype=numpy.uint8)
+
+    for codon, amino_acid in CODON_TABLE.items():
+        _table[(_letters.index(codon[0]) * _size + _letters.index(codon[1])) * _size +
+               _letters.index(codon[2])] = ord(amino_acid)
+
+
+def _to_bytes(seq):
+    if isinstance(seq, bytes):
+        return seq
+    return seq.encode('ascii')
+
+
+def reverse_complement(seq):
+    """Return the reverse complement of the sequence as bytes."""
+    return _to_bytes(seq).translate(_complement)[::-1]
+
+
+def _invalid_codon(seq):
+    for i in range(0, len(seq) - len(seq) % 3, 3):
+        codon = seq[i:i + 3].decode('ascii')
+
+        if codon.upper() not in CODON_TABLE:
+            return ValueError("Codon '" + codon + "' is invalid")
+
+
+def _translate_bytes(seq):
+    if numpy is None:
+        try:
+            return ''.join([CODON_TABLE[seq[i:i + 3].decode('ascii').upper()]
+                            for i in range(0, len(seq) - len(seq) % 3, 3)])
+        except KeyError:
+            raise _invalid_codon(seq)
+
+    length = len(seq) - len(seq) % 3
+
+    if length == 0:
+        return ''
+
+    codes = _codes[numpy.frombuffer(seq, dtype=numpy.uint8, count=length)].reshape(-1, 3)
+    amino_acids = _table[(codes[:, 0] * _size + codes[:, 1]) * _size + codes[:, 2]]
+
+    if not amino_acids.all():
+        raise _invalid_codon(seq)
+
+    return amino_acids.tobytes().decode('ascii')
+
+
+def translate(seq, frame=1):
+    """Return the translation of the sequence in the frame."""
+    if frame not in FRAMES:
+        raise ValueError('Invalid frame: ' + str(frame))
+
+    if frame < 0:
+        return _translate_bytes(reverse_complement(seq)[-frame - 1:])
+
+    return _translate_bytes(_to_bytes(seq)[frame - 1:])
+
+
+def _strand_amino_acids(codes):
+    """Return the amino acid bytes of the codons at every position of the letter codes."""
+    return _table[(codes[:-2] * _size + codes[1:-1]) * _size + codes[2:]]
+
+
+def six_frames(seq):
+    """Return a dict of frame to the translation of the sequence in the six frames. The codons of
+    each strand are looked up once for all its frames."""
+    forward = _to_bytes(seq)
+
+    if numpy is None or len(forward) < 3:
+        reverse = reverse_complement(forward)
+        frames = {}
+
+        for frame in FRAMES:
+            if frame < 0:
+                frames[frame] = _translate_bytes(reverse[-frame - 1:])
+            else:
+                frames[frame] = _translate_bytes(forward[frame - 1:])
+
+        return frames
+
+    codes = _codes[numpy.frombuffer(forward, dtype=numpy.uint8)]
+    strands = {1: _strand_amino_acids(codes),
+               -1: _strand_amino_acids(_complement_codes[codes[::-1]])}
+    frames = {}
+
+    for frame in FRAMES:
+        amino_acids = strands[1 if frame > 0 else -1][abs(frame) - 1::3]
+
+        if amino_acids.all():
+            frames[frame] = amino_acids.tobytes().decode('ascii')
+        else:
+            # Raise the ValueError of the invalid codon
+            frames[frame] = translate(forward, frame)
+
+    return frames
+
+
+class translator:
+    """Translate sequences by name with an LRU cache of (name, frame). fetch(name) returns the
+    sequence. The six frames of a sequence are translated together when one of them is missed."""
+    def __init__(self, fetch, cache_size=CACHE_SIZE):
+        self.fetch = fetch
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def translate(self, name, frame=1):
+        key = (name, frame)
+
+        if key in self.cache:
+            self.hits += 1
+            # Move the key to the end, the most recently used
+            value = self.cache.pop(key)
+            self.cache[key] = value
+            return value
+
+        self.misses += 1
+
+        seq = self.fetch(name)
+
+        try:
+            frames = six_frames(seq)
+        except ValueError:
+            # An invalid codon in another frame, translate only this one
+            frames = {frame: translate(seq, frame)}
+
+        for each_frame, value in frames.items():
+            self.cache.pop((name, each_frame), None)
+            self.cache[(name, each_frame)] = value
+
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return frames[frame]
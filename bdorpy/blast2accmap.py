@@ -13,101 +13,250 @@
 # Required:
 # * Biopython: http://biopython.org
 #
-# Usage: blast2accmap <blast.xml> [options]
+# Usage: blast2accmap <blast.xml> [<blast.xml> ...] [options]
 #
 # Options:
 # -e, --evalue      NUM: evalue thresh (default: 0.01)
 # -t, --min_hit_num NUM: minimum number of hit sequences (default: 1)
 # -o, --output      STR: output file name. If this option is not specified, the script will generate
-#                        one with unique identifier at current directory.
+#                        one with unique identifier at current directory. With multiple input files,
+#                        it is the output directory unless -m is specified, and the outputs keep
+#                        the paths of the inputs relative to their common directory.
+# -m, --merge          : merge the results of multiple input files into one output file with combined
+#                        counts (default: false)
+# -p, --process     NUM: number of processes (CPUs) to use for multiple input files (default: 1)
+# --progress        NUM: write a progress line to stderr every NUM seconds. 0 means no progress
+#                        lines. (default: 0)
+# --metrics         STR: write the stage times, counters and rates to a JSON file at exit
 #
 # File Formats:
 # * blast.xml: blast XML
 # * output: blastaccmap
 #
+# Support multiple input files and Unix style pathname pattern. For example:
+# * blast2accmap <chunk_1.xml> <chunk_2.xml> ... [-p NUM] [-o DIR]
+# * blast2accmap 'chunk_*.xml' -m -o merged.blastaccmap [-p NUM]
+#
 # This script is written for the sake of making training data for WildSpan.
 
+import os
 import sys
 import argparse
 import re
+import shutil
+from multiprocessing import Pool
 from Bio.Blast import NCBIXML
-from fhandle import name, logmsg
+from fhandle import name, logmsg, writer, zfile
 
+gi = re.compile('gi\|(\d+)\|')
 
-def main():
-    proglog = logmsg.message(prog='blast2accmap', cmd=' '.join(sys.argv))
 
-    parser = argparse.ArgumentParser(description='blast2accmap - Extract names of query and hit sequences')
-    parser.add_argument('input_file')
-    parser.add_argument('-e', '--evalue', dest='ev_thresh', type=float, default=0.01,
-                        help='evalue thresh (default: 0.01)')
-    parser.add_argument('-t', '--min_hit_num', dest='min_hit_num', type=int, default=1,
-                        help='minimum number of hit sequences (default: 1)')
-    parser.add_argument('-o', '--output', dest='output_file',
-                        help='output file name. If this option is not specified, the script will generate '
-                        'one with unique identifier at current directory.')
-    args = parser.parse_args()
+def write_records(blast_records, args, fw, log=None):
+    """Write the accession map of the records. Return the number of total and parsed queries.
+    The records are counted in the message log if it is not None."""
+    total_query_num = 0
+    parsed_query_num = 0
+
+    for blast_record in blast_records:
+        total_query_num += 1
+
+        if log is not None:
+            log.count('records')
+
+        if len(blast_record.alignments) < args.min_hit_num:
+            continue
+
+        hit_accs = []
+
+        for alignment in blast_record.alignments:
+            for hsp in alignment.hsps:
+                if alignment.accession in blast_record.query:
+                    """If query hit itself, ignore it. """
+                    continue
+
+                if hsp.expect <= args.ev_thresh:
+                    match = gi.match(alignment.hit_id).group(1)
+
+                    if match is None:
+                        print(alignment.accession + ' does not have gi.')
+                        hit_accs.append(alignment.accession)
+                    else:
+                        hit_accs.append(match)
+                    break
+
+        if len(hit_accs) >= args.min_hit_num:
+            parsed_query_num += 1
+            fw.write(blast_record.query + '\t' + blast_record.query + ',')
+            fw.write(','.join(hit_accs) + '\n')
+
+    return total_query_num, parsed_query_num
+
+
+def write_head(args, fw, proglog):
+    for i in proglog.start_message():
+        fw.write(i)
+
+    fw.write('#\n')
+    fw.write('# E-value threshold: ' + str(args.ev_thresh) + '\n')
+    fw.write('# min hit number: ' + str(args.min_hit_num) + '\n')
+    fw.write('#\n')
+    fw.write('# filename    query_accession,hit_accession_1,hit_accession_2, ...\n\n')
+    fw.flush()
+
+
+def write_tail(fw, proglog, total_query_num, parsed_query_num):
+    fw.write('\n')
+    fw.write('# Total queries: ' + str(total_query_num) + '\n')
+    fw.write('# Parsed queries: ' + str(parsed_query_num) + '\n')
+    fw.write('#\n')
+
+    for i in proglog.end_message():
+        fw.write(i)
+
+    fw.flush()
 
-    if args.output_file is None:
-        args.output_file = args.input_file + '_out_' + name.genid() + 'blastaccmap'
+
+def parse_file(input_file, output_file, args, proglog):
+    """Parse an input file to its own accession map. Return the number of parsed queries."""
+    with zfile.zopen(input_file, 'r', counter=lambda n: proglog.count('bytes', n)) as result_handle, \
+            writer.rowwriter(zfile.zopen(output_file, 'w')) as fw:
+        write_head(args, fw, proglog)
+
+        with proglog.stage('parse'):
+            total_query_num, parsed_query_num = write_records(NCBIXML.parse(result_handle), args, fw, proglog)
+
+        write_tail(fw, proglog, total_query_num, parsed_query_num)
+
+    return parsed_query_num
+
+
+def parse_file_task(task):
+    """Return the number of parsed queries and bytes read of parse_file."""
+    input_file, output_file, args, cmd = task
+    proglog = logmsg.message(prog='blast2accmap', cmd=cmd)
+    parsed_query_num = parse_file(input_file, output_file, args, proglog)
+    return parsed_query_num, proglog.counters.get('bytes', 0)
+
+
+def parse_part(task):
+    """Return the numbers of total and parsed queries, and the bytes read."""
+    input_file, args, part_file = task
+    bytes_read = [0]
+
+    def counter(n):
+        bytes_read[0] += n
+
+    with zfile.zopen(input_file, 'r', counter=counter) as result_handle, \
+            writer.rowwriter(open(part_file, 'w')) as fw:
+        return write_records(NCBIXML.parse(result_handle), args, fw) + (bytes_read[0],)
+
+
+def parse_merged(args, proglog):
+    """Parse the input files in a process pool, and merge the results into one accession map in
+    the order of the input files."""
+    tasks = []
+
+    for i, input_file in enumerate(args.input_files):
+        tasks.append((input_file, args, args.output_file + '.part' + str(i)))
 
     total_query_num = 0
     parsed_query_num = 0
 
-    with open(args.input_file, 'r') as result_handle, open(args.output_file, 'w') as fw:
-        blast_records = NCBIXML.parse(result_handle)
+    with writer.rowwriter(zfile.zopen(args.output_file, 'w')) as fw:
+        write_head(args, fw, proglog)
+
+        with proglog.stage('parse'):
+            pool = Pool(processes=args.process_num)
+
+            for task, result in zip(tasks, pool.imap(parse_part, tasks)):
+                fw.drain()
 
-        for i in proglog.start_message():
-            fw.write(i)
+                with open(task[-1], 'r') as fin:
+                    shutil.copyfileobj(fin, fw.handle)
 
-        fw.write('#\n')
-        fw.write('# E-value threshold: ' + str(args.ev_thresh) + '\n')
-        fw.write('# min hit number: ' + str(args.min_hit_num) + '\n')
-        fw.write('#\n')
-        fw.write('# filename    query_accession,hit_accession_1,hit_accession_2, ...\n\n')
-        fw.flush()
+                os.remove(task[-1])
+                total_query_num += result[0]
+                parsed_query_num += result[1]
+                proglog.count('files')
+                proglog.count('records', result[0])
+                proglog.count('bytes', result[2])
 
-        gi = re.compile('gi\|(\d+)\|')
+            pool.close()
+            pool.join()
+        write_tail(fw, proglog, total_query_num, parsed_query_num)
 
-        for blast_record in blast_records:
-            total_query_num += 1
 
-            if len(blast_record.alignments) < args.min_hit_num:
-                continue
+def parse_batch(args, proglog):
+    """Parse each input file to its own accession map in a process pool."""
+    tasks = []
 
-            hit_accs = []
+    if args.output_file is not None:
+        # The inputs with the same basename in different directories, e.g. the chunks of array jobs,
+        # are written to the subdirectories of their relative paths
+        try:
+            output_files = name.batch_outputs(args.input_files, args.output_file, '.blastaccmap')
+        except ValueError as e:
+            sys.exit(str(e))
 
-            for alignment in blast_record.alignments:
-                for hsp in alignment.hsps:
-                    if alignment.accession in blast_record.query:
-                        """If query hit itself, ignore it. """
-                        continue
+    for i, input_file in enumerate(args.input_files):
+        if args.output_file is None:
+            output_file = input_file + '_out_' + name.genid() + 'blastaccmap'
+        else:
+            output_file = output_files[i]
 
-                    if hsp.expect <= args.ev_thresh:
-                        match = gi.match(alignment.hit_id).group(1)
+            if not os.path.exists(os.path.dirname(output_file)):
+                os.makedirs(os.path.dirname(output_file))
+        tasks.append((input_file, output_file, args, proglog.cmd))
 
-                        if match is None:
-                            print(alignment.accession + ' does not have gi.')
-                            hit_accs.append(alignment.accession)
-                        else:
-                            hit_accs.append(match)
-                        break
+    with proglog.stage('parse'):
+        pool = Pool(processes=args.process_num)
 
-            if len(hit_accs) >= args.min_hit_num:
-                parsed_query_num += 1
-                fw.write(blast_record.query + '\t' + blast_record.query + ',')
-                fw.write(','.join(hit_accs) + '\n')
-                fw.flush()
+        for task, (parsed_query_num, bytes_read) in zip(tasks, pool.imap(parse_file_task, tasks)):
+            sys.stderr.write(task[0] + ' -> ' + task[1] + ': ' + str(parsed_query_num) + ' queries\n')
+            proglog.count('files')
+            proglog.count('bytes', bytes_read)
+
+        pool.close()
+        pool.join()
+
+
+def main():
+    proglog = logmsg.message(prog='blast2accmap', cmd=' '.join(sys.argv))
+
+    parser = argparse.ArgumentParser(description='blast2accmap - Extract names of query and hit sequences')
+    parser.add_argument('input_files', nargs='+')
+    parser.add_argument('-e', '--evalue', dest='ev_thresh', type=float, default=0.01,
+                        help='evalue thresh (default: 0.01)')
+    parser.add_argument('-t', '--min_hit_num', dest='min_hit_num', type=int, default=1,
+                        help='minimum number of hit sequences (default: 1)')
+    parser.add_argument('-o', '--output', dest='output_file',
+                        help='output file name. If this option is not specified, the script will generate '
+                        'one with unique identifier at current directory. With multiple input files, it is '
+                        'the output directory unless -m is specified, and the outputs keep the paths of the inputs '
+                        'relative to their common directory.')
+    parser.add_argument('-m', '--merge', dest='merge', action='store_true', default=False,
+                        help='merge the results of multiple input files into one output file with combined '
+                        'counts (default: false)')
+    parser.add_argument('-p', '--process', dest='process_num', type=int, default=1,
+                        help='number of processes (CPUs) to use for multiple input files (default: 1)')
+    logmsg.add_arguments(parser)
+    args = parser.parse_args()
+    args.input_files = name.expand(args.input_files)
+    proglog.setup(args.progress, args.metrics)
 
-        fw.write('\n')
-        fw.write('# Total queries: ' + str(total_query_num) + '\n')
-        fw.write('# Parsed queries: ' + str(parsed_query_num) + '\n')
-        fw.write('#\n')
+    if len(args.input_files) == 0:
+        parser.error('no input files')
 
-        for i in proglog.end_message():
-            fw.write(i)
+    if len(args.input_files) == 1 or args.merge is True:
+        if args.output_file is None:
+            args.output_file = args.input_files[0] + '_out_' + name.genid() + 'blastaccmap'
 
-        fw.flush()
+    if len(args.input_files) == 1:
+        parse_file(args.input_files[0], args.output_file, args, proglog)
+    elif args.merge is True:
+        parse_merged(args, proglog)
+    else:
+        parse_batch(args, proglog)
 
 if __name__ == '__main__':
     main()
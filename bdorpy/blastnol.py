@@ -10,23 +10,46 @@
 # Version: 1.0
 # Created: 2013.2.7
 #
-# Requirement:
-# * Biopython: http://biopython.org
-#
 # Usage: blastnol <input.blastlist> [options]
 #
 # Options:
 # -o, --output-directory STR: output directory name. If this option is not specified, the script will generate
 #                             one with unique identifier at current directory.
 # -q, --query-sequence   STR: fasta file of query sequence. If this option is specified, the script will
-#                             generate a new fasta file that contains truncated long sequences.
+#                             generate a new fasta file that contains truncated long sequences. The fasta
+#                             file is indexed as <file>.fai (samtools faidx) and read by memory mapping. A
+#                             compressed file is first decompressed to query.fa in the output directory.
+# -S, --buffer-size      NUM: memory in MB used to sort the hsps. The hsps that do not fit are sorted
+#                             in temporary files in the output directory. (default: 64)
+# -p, --process          NUM: number of processes (CPUs) to combine the hsps and check the overlap of the
+#                             queries (default: 1)
+# --substring-match         : group an hsp with the first hit whose name contains the hit name of the
+#                             hsp, as the versions before exact matching. (default: false)
+# --stream                  : group, check and write the hits one query at a time, so the memory is bounded
+#                             by the largest query. (default: false)
+# --progress             NUM: write a progress line to stderr every NUM seconds. 0 means no progress
+#                             lines. (default: 0)
+# --metrics              STR: write the stage times, counters and rates to a JSON file at exit
 
 import os
+import sys
 import argparse
-from subprocess import Popen, PIPE
-from Bio import SeqIO
+import itertools
+from operator import itemgetter
+from multiprocessing import Pool
+from collections import OrderedDict
+import shutil
 from alignment import calculate
-from fhandle import name, header
+from fhandle import name, header, writer, zfile, blastlist, logmsg, extsort, fa
+
+# The order of hsps: query strand, query name, evalue, identity percent, hsp length, hit coverage
+# and query length, the same as sort -t$'\t' -k9g,9 -k4d,4 -k18g,18 -k22gr,22 -k19gr,19 -k26gr,26 -k6gr
+SORT_KEYS = ('9g', '4d', '18g', '22gr', '19gr', '26gr', '6gr')
+# With --stream, the query names that are equal in the dictionary order are also compared as text,
+# so the hsps of a query are consecutive.
+STREAM_SORT_KEYS = ('9g', '4d', '4', '18g', '22gr', '19gr', '26gr', '6gr')
+# Number of queries sent to a worker at a time with -p
+QUERY_CHUNK = 100
 
 
 def combine_hsps(hsps):
@@ -42,16 +65,227 @@ def combine_hsps(hsps):
         else:
             pos_start = min(pos_start, hsp_start)
             pos_end = max(pos_end, hsp_end)
-        lines = lines + line
+        lines.extend(line)
 
     return pos_start, pos_end, lines
 
 
-def get_start_pos(item):
-    return item[1][0][0]
+def read_lines(filename, log):
+    with zfile.zopen(filename, 'r') as fin:
+        for rec in blastlist.parse(fin):
+            log.count('hsps')
+            yield rec.line
+
+
+def find_substring_hit(hits, hit_name):
+    """Return the first hit name of the hits that contains hit_name, the grouping of the old versions."""
+    for name in hits:
+        if hit_name in name:
+            return name
+    return hit_name
+
+
+def iter_hsps(lines):
+    """Yield (query_name, hit_name, query_hsp_start, query_hsp_end, line) of the blastlist lines.
+    The query name of a minus strand hsp is prefixed with '-'."""
+    for line in lines:
+        rec = blastlist.record(line)
+        query_strand = rec.query_strand
+
+        if query_strand is not None and query_strand < 0:
+            yield '-' + rec.query_name, rec.hit_name, rec.query_hsp_end, rec.query_hsp_start, line
+        else:
+            yield rec.query_name, rec.hit_name, rec.query_hsp_start, rec.query_hsp_end, line
+
+
+def add_hsp(hits, hsp, substring_match=False):
+    """Add the hsp to hits, an OrderedDict of hit name to a list of (start, end, [line])."""
+    query_name, hit_name, query_hsp_start, query_hsp_end, line = hsp
+
+    if substring_match is True:
+        hit_name = find_substring_hit(hits, hit_name)
+
+    if hit_name in hits:
+        hits[hit_name].append((query_hsp_start, query_hsp_end, [line]))
+    else:
+        hits[hit_name] = [(query_hsp_start, query_hsp_end, [line])]
+
+
+def combine_hits(hits):
+    """Combine the hsps of each hit. Return a list of (hit_name, (start, end), lines, hit_rank)."""
+    combined = []
+
+    for hit_rank, (hit_name, hsps) in enumerate(hits.items(), 1):
+        if len(hsps) > 1:
+            pos_start, pos_end, lines = combine_hsps(hsps)
+            combined.append((hit_name, (pos_start, pos_end), lines, hit_rank))
+        else:
+            combined.append((hit_name, (hsps[0][0], hsps[0][1]), hsps[0][2], hit_rank))
+
+    return combined
+
+
+def chain_hits(hits):
+    """Check overlap. The hits are swept by start position, and the hit with the better rank is
+    retained when two hits overlap. Return (hit_names, positions, lines, hit_ranks) of the chain."""
+    chain = [hits[i] for i in calculate.get_non_overlap_chain([hit[1] for hit in hits],
+                                                               [hit[3] for hit in hits])]
+
+    return ([hit[0] for hit in chain], [hit[1] for hit in chain],
+            [hit[2] for hit in chain], [hit[3] for hit in chain])
+
+
+def group_queries(hsps, substring_match=False):
+    """Yield (query_name, hits) of the consecutive hsps of each query."""
+    for query_name, query_hsps in itertools.groupby(hsps, key=itemgetter(0)):
+        hits = OrderedDict()
+
+        for hsp in query_hsps:
+            add_hsp(hits, hsp, substring_match)
+
+        yield query_name, hits
+
+
+def resolve_query(item):
+    """Combine the hsps and check the overlap of the hits of a query. Return (query_name, chain,
+    hit_names), where hit_names is the set of hit names of the lines covered by the chain."""
+    query_name, hits = item
+    chain = chain_hits(combine_hits(hits))
+    hit_names = set()
+
+    if len(chain[0]) > 1:
+        for lines in chain[2]:
+            for line in lines:
+                hit_names.add(blastlist.record(line).hit_name)
+
+    return query_name, chain, hit_names
+
+
+def resolve_chunk(chunk):
+    return [resolve_query(item) for item in chunk]
+
+
+def resolve_queries(queries, pool=None, process_num=1):
+    """Yield the resolve_query results of (query_name, hits) of the queries in order. With a pool,
+    the queries are sent to the workers in chunks of QUERY_CHUNK, and no more than a window of chunks
+    are in flight, so a stream of queries is not read ahead to the end."""
+    if pool is None:
+        for item in queries:
+            yield resolve_query(item)
+        return
+
+    window = process_num * 4
+    queries = iter(queries)
+
+    while True:
+        chunks = []
+
+        for i in range(window):
+            chunk = list(itertools.islice(queries, QUERY_CHUNK))
+
+            if not chunk:
+                break
+
+            chunks.append(chunk)
+
+        if not chunks:
+            break
+
+        for results in pool.imap(resolve_chunk, chunks):
+            for result in results:
+                yield result
+
+
+def open_query_fa(filename, output_dir):
+    """Return the fa.faidx of the query fasta file. A compressed file is decompressed to the output
+    directory first."""
+    if zfile.detect(filename) is not None:
+        with zfile.zopen(filename, 'r') as fin, open(output_dir + '/query.fa', 'w') as fw:
+            shutil.copyfileobj(fin, fw)
+        filename = output_dir + '/query.fa'
+
+    return fa.faidx(filename)
+
+
+class coverwriter:
+    """Write the chains of the queries to hit_cover.tsv, and the query sequences to truncated.fa
+    if query_fa, an fa.faidx, is not None."""
+    def __init__(self, handle, fw_fa=None, query_fa=None):
+        self.fw = writer.rowwriter(handle)
+        self.fw_fa = fw_fa
+        self.query_fa = query_fa
+        self.written = set()
+        self.query_num = 0
+        self.query_num_cover_eq_two = 0
+        self.query_num_cover_eq_three = 0
+        self.query_num_cover_ge_four = 0
+        self.hit_set = set()
+
+        hr = header.blastlist()
+        self.fw.write(hr.get_all_tab() + '\n')
+
+    def write_query(self, query, chain, hit_names=None):
+        """Write the chain of a query. hit_names is the set of hit names of the lines of the chain,
+        which is collected here if it is None."""
+        query = query.split(' ')[0]
+        chain_names, positions, lines_list, hit_ranks = chain
+
+        if len(chain_names) > 1:
+            self.query_num += 1
+
+            if len(chain_names) == 2:
+                self.query_num_cover_eq_two += 1
+            elif len(chain_names) == 3:
+                self.query_num_cover_eq_three += 1
+            else:
+                self.query_num_cover_ge_four += 1
+
+            for lines in lines_list:
+                for line in lines:
+                    if hit_names is None:
+                        self.hit_set.add(blastlist.record(line).hit_name)
+                    self.fw.write(line)
+
+            if hit_names is not None:
+                self.hit_set.update(hit_names)
+
+            if self.query_fa is not None:
+                # Truncated queries
+                segment_num = 0
+                for pos_start, pos_end in positions:
+                    self.fw_fa.write('>' + query + '_s' + str(segment_num) + '\n')
+                    self.fw_fa.write(self.query_fa.fetch(query, pos_start - 1, pos_end) + '\n')
+                    segment_num += 1
+                self.written.add(query)
+        else:
+            if self.query_fa is not None:
+                # Full-sequece queries
+                self.fw_fa.write('>' + query + '\n')
+                self.fw_fa.write(self.query_fa.fetch(query) + '\n')
+                self.written.add(query)
+
+    def close(self):
+        if self.query_fa is not None:
+            # No-hit queries
+            for query in self.query_fa:
+                if query not in self.written:
+                    self.fw_fa.write('>' + query + '\n')
+                    self.fw_fa.write(self.query_fa.fetch(query) + '\n')
+            self.fw_fa.close()
+            self.query_fa.close()
+
+        self.fw.write('\n')
+        self.fw.write('# Number of queries that cover >= 2 hits: ' + str(self.query_num) + '\n')
+        self.fw.write('#   Cover 2 hits: ' + str(self.query_num_cover_eq_two) + '\n')
+        self.fw.write('#   Cover 3 hits: ' + str(self.query_num_cover_eq_three) + '\n')
+        self.fw.write('#   Cover >= 4 hits: ' + str(self.query_num_cover_ge_four) + '\n')
+        self.fw.write('# Number of covered hits: ' + str(len(self.hit_set)))
+        self.fw.close()
 
 
 def main():
+    proglog = logmsg.message(prog='blastnol', cmd=' '.join(sys.argv))
+
     parser = argparse.ArgumentParser(description='blastnol - Find the non-overlapping hits in the blast result')
     parser.add_argument('input_file')
     parser.add_argument('-o', '--output-directory', dest='output_dir',
@@ -59,8 +293,24 @@ def main():
                         'one with unique identifier at current directory.')
     parser.add_argument('-q', '--query-sequence', dest='query_fa',
                         help='fasta file of query sequence. If this option is specified, the script will '
-                        'generate a new fasta file that contains truncated long sequences.')
+                        'generate a new fasta file that contains truncated long sequences. The fasta file '
+                        'is indexed as <file>.fai (samtools faidx) and read by memory mapping. A compressed '
+                        'file is first decompressed to query.fa in the output directory.')
+    parser.add_argument('-S', '--buffer-size', dest='buffer_size', type=int, default=64,
+                        help='memory in MB used to sort the hsps. The hsps that do not fit are sorted in '
+                        'temporary files in the output directory. (default: 64)')
+    parser.add_argument('--substring-match', dest='substring_match', action='store_true', default=False,
+                        help='group an hsp with the first hit whose name contains the hit name of the hsp, '
+                        'as the versions before exact matching. (default: false)')
+    parser.add_argument('-p', '--process', dest='process_num', type=int, default=1,
+                        help='number of processes (CPUs) to combine the hsps and check the overlap of the '
+                        'queries (default: 1)')
+    parser.add_argument('--stream', dest='stream', action='store_true', default=False,
+                        help='group, check and write the hits one query at a time, so the memory is bounded by '
+                        'the largest query. (default: false)')
+    logmsg.add_arguments(parser)
     args = parser.parse_args()
+    proglog.setup(args.progress, args.metrics)
 
     if args.output_dir is None:
         args.output_dir = args.input_file + '_out_' + name.genid()
@@ -71,143 +321,64 @@ def main():
         os.makedirs(args.output_dir)
 
     if args.query_fa is not None:
-        query_fa = dict(SeqIO.index(args.query_fa, 'fasta'))
-        fw_fa = open(args.output_dir + '/truncated.fa', 'w')
-
-    with open(args.output_dir + '/sort.temp', 'w') as fwsort:
-        awk_cmd = "awk -F'\t' 'int($1) { print $0 }' " + args.input_file
-        sort_cmd = "sort -t$'\t' -k9g,9 -k4d,4 -k18g,18 -k22gr,22 -k19gr,19 -k26gr,26 -k6gr"
-        awk_proc = Popen(awk_cmd, stdout=PIPE, executable='/bin/bash', shell=True)
-        sort_proc = Popen(sort_cmd, stdin=awk_proc.stdout, stdout=fwsort, executable='/bin/bash', shell=True)
-        sort_proc.communicate()
-
-    seq = {}
-
-    with open(args.output_dir + '/sort.temp', 'r') as fi:
-        for line in fi:
-            data = line.split('\t')
-            query_name = data[3]
-            hit_name = data[4]
-            query_strand = int(data[8])
-
-            if query_strand < 0:
-                query_name = '-' + query_name
-                query_hsp_start = int(data[7])
-                query_hsp_end = int(data[6])
-            else:
-                query_hsp_start = int(data[6])
-                query_hsp_end = int(data[7])
-
-            if query_name in seq:
-                for i in range(len(seq[query_name])):
-                    if hit_name in seq[query_name][i][0]:
-                        seq[query_name][i][1].append((query_hsp_start, query_hsp_end, [line]))
-                        break
-                else:
-                    seq[query_name].append((hit_name, [(query_hsp_start, query_hsp_end, [line])]))
-            else:
-                seq.update({query_name: [(hit_name, [(query_hsp_start, query_hsp_end, [line])])]})
-
-    # Combine hsps
-    for query_name in seq:
-        hit_rank = 1
-        for i in range(len(seq[query_name])):
-            hit = seq[query_name][i]
-            if len(hit[1]) > 1:
-                # Combine hsps
-                pos_start, pos_end, lines = combine_hsps(hit[1])
-                seq[query_name][i] = ([hit[0]], [(pos_start, pos_end)], [lines], [hit_rank])
-            else:
-                seq[query_name][i] = ([hit[0]], [(hit[1][0][0], hit[1][0][1])], [hit[1][0][2]], [hit_rank])
-            hit_rank += 1
-
-    # Sort hits by start position
-    for query_name in seq:
-        seq[query_name] = sorted(seq[query_name], key=get_start_pos)
-
-    # Check overlap
-    for query_name, hits in seq.items():
-        while len(hits) > 1:
-            position = calculate.get_non_overlap((hits[0][1][0][0], hits[0][1][-1][1]), (hits[1][1][0][0], hits[1][1][0][1]))
-            if position is not None:
-                # The two sequences are non-overlapping, combine them
-                seq[query_name][0] = (hits[0][0] + hits[1][0], hits[0][1] + hits[1][1], hits[0][2] + hits[1][2], hits[0][3] + hits[1][3])
-                seq[query_name].pop(1)
-            else:
-                # Compare the hit rank to determine which one is retained
-                if seq[query_name][0][3][-1] < seq[query_name][1][3][0]:
-                    # Discard the next hit
-                    seq[query_name].pop(1)
-                else:
-                    # Discard the last hit, and join the next hit
-                    seq[query_name][0][0].pop(-1)
-                    seq[query_name][0][1].pop(-1)
-                    seq[query_name][0][2].pop(-1)
-                    seq[query_name][0][3].pop(-1)
-                    seq[query_name][0] = (hits[0][0] + hits[1][0], hits[0][1] + hits[1][1], hits[0][2] + hits[1][2], hits[0][3] + hits[1][3])
-                    seq[query_name].pop(1)
-
-    # Write data
-    with open(args.output_dir + '/hit_cover.tsv', 'w') as fw:
-        query_num = 0
-        query_num_cover_eq_two = 0
-        query_num_cover_eq_three = 0
-        query_num_cover_ge_four = 0
-
-        hit_set = set()
-        hr = header.blastlist()
-        fw.write(hr.get_all_tab() + '\n')
-        fw.flush()
-
-        for query, hits in seq.items():
-            query = query.split(' ')[0]
-
-            if len(hits[0][0]) > 1:
-                query_num += 1
-
-                if len(hits[0][0]) == 2:
-                    query_num_cover_eq_two += 1
-                elif len(hits[0][0]) == 3:
-                    query_num_cover_eq_three += 1
-                else:
-                    query_num_cover_ge_four += 1
-
-                for lines in hits[0][2]:
-                    for line in lines:
-                        hit_set.add(line.split('\t')[4])
-                        fw.write(line)
-                    fw.flush()
-
-                if args.query_fa is not None:
-                    # Truncated queries
-                    segment_num = 0
-                    for pos_start, pos_end in hits[0][1]:
-                        fw_fa.write('>' + query + '_s' + str(segment_num) + '\n')
-                        fw_fa.write(query_fa[query].seq.tostring()[pos_start - 1:pos_end] + '\n')
-                        fw_fa.flush()
-                        segment_num += 1
-                    query_fa.pop(query)
-            else:
-                if args.query_fa is not None:
-                    # Full-sequece queries
-                    fw_fa.write('>' + query + '\n')
-                    fw_fa.write(query_fa[query].seq.tostring() + '\n')
-                    query_fa.pop(query)
+        with proglog.stage('load_query'):
+            query_fa = open_query_fa(args.query_fa, args.output_dir)
+            proglog.count('sequences', len(query_fa))
 
-        if args.query_fa is not None:
-            # No-hit queries
-            for query in query_fa:
-                fw_fa.write('>' + query + '\n')
-                fw_fa.write(query_fa[query].seq.tostring() + '\n')
-                fw_fa.flush()
-            fw_fa.close()
-
-        fw.write('\n')
-        fw.write('# Number of queries that cover >= 2 hits: ' + str(query_num) + '\n')
-        fw.write('#   Cover 2 hits: ' + str(query_num_cover_eq_two) + '\n')
-        fw.write('#   Cover 3 hits: ' + str(query_num_cover_eq_three) + '\n')
-        fw.write('#   Cover >= 4 hits: ' + str(query_num_cover_ge_four) + '\n')
-        fw.write('# Number of covered hits: ' + str(len(hit_set)))
+        fw_fa = writer.rowwriter(open(args.output_dir + '/truncated.fa', 'w'))
+    else:
+        query_fa = None
+        fw_fa = None
+
+    if args.stream is True:
+        sort_keys = STREAM_SORT_KEYS
+    else:
+        sort_keys = SORT_KEYS
+
+    with proglog.stage('sort'):
+        sorted_lines = extsort.sort_lines(read_lines(args.input_file, proglog), sort_keys,
+                                          buffer_size=args.buffer_size * 1024 * 1024, tmpdir=args.output_dir)
+
+    fw = coverwriter(open(args.output_dir + '/hit_cover.tsv', 'w'), fw_fa, query_fa)
+
+    if args.process_num > 1:
+        pool = Pool(processes=args.process_num)
+    else:
+        pool = None
+
+    if args.stream is True:
+        with proglog.stage('stream'):
+            # The sorted hsps of a query are consecutive, so each query is written before the next
+            # ones are read.
+            queries = group_queries(iter_hsps(sorted_lines), args.substring_match)
+
+            for query_name, chain, hit_names in resolve_queries(queries, pool, args.process_num):
+                fw.write_query(query_name, chain, hit_names)
+                proglog.count('queries')
+    else:
+        with proglog.stage('group'):
+            seq = OrderedDict()
+
+            for hsp in iter_hsps(sorted_lines):
+                # The hits of a query are kept in the order of hit rank
+                add_hsp(seq.setdefault(hsp[0], OrderedDict()), hsp, args.substring_match)
+
+            proglog.count('queries', len(seq))
+
+        with proglog.stage('overlap'):
+            results = list(resolve_queries(seq.items(), pool, args.process_num))
+            seq = None
+
+        with proglog.stage('write'):
+            for query_name, chain, hit_names in results:
+                fw.write_query(query_name, chain, hit_names)
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    with proglog.stage('write'):
+        fw.close()
 
 if __name__ == '__main__':
     main()
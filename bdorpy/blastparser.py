@@ -13,237 +13,747 @@
 # Required :
 # * Biopython: http://biopython.org
 #
-# Usage: blastparser <blast.xml> [options]
+# Usage: blastparser <blast.xml|blast.tab> [<blast.xml|blast.tab> ...] [options]
 #
 # Options:
 # -e, --evalue NUM: evalue thresh (default: 0.01)
 # -r, --rank   NUM: alignment rank (default: 250)
 # -o, --output STR: output file name. If this option is not specified, the script will generate
-#                   one with unique identifier at current directory.
+#                   one with unique identifier at current directory. With multiple input files, it
+#                   is the output directory unless -m is specified, and the outputs keep the paths
+#                   of the inputs relative to their common directory.
+# -m, --merge     : merge the results of multiple input files into one output file with combined
+#                   counts (default: false)
 # -b, --best      : filter results with best selection. If this option is specified, the script
-#                   will select one best hsp for each query with the following criteria. The -r,
+#                   will select -n best hsps for each query with the criteria of -k. The -r,
 #                   --rank option will be useless. (default: false)
+# -n, --best-num NUM: number of best hsps for each query with -b (default: 1)
+# -k, --best-key STR: criteria of the best selection (default: evalue)
 #
-#                   Criteria: (order by number)
+#                   evalue: (order by number)
 #                    1. Lowest E-value
 #                    2. Highest Identity percent
 #                    3. Highest Hsp length
 #                    4. The first hit
+#                   bitscore: Highest bit score, then lowest E-value
+#                   identity: Highest identity percent, then lowest E-value
+#                   coverage: Highest query coverage, then lowest E-value
 #
 # -t, --title     : print header (default: false)
+# -s, --stream    : parse the XML with the streaming parser in fhandle.blastxml instead of
+#                   Bio.Blast.NCBIXML. The alignment strings are skipped, so it is faster and
+#                   uses less memory on large files. The output is the same. (default: false)
+# -p, --process NUM: number of processes (CPUs) to use. If NUM > 1, the input file is split at
+#                   <Iteration> boundaries and the shards are parsed in parallel with the streaming
+#                   parser. With multiple input files, the files are parsed in parallel instead.
+#                   (default: 1)
+# -f, --format STR: input format. 'xml' for the NCBI blast XML, 'tab' for the blast tabular output
+#                   (-outfmt 6 or 7). The tabular input fills in the columns it has, and the others
+#                   are written as NA. (default: xml)
+# -F, --fields STR: the columns of the tabular input with the names of -outfmt 6, e.g.
+#                   'qseqid sseqid pident length mismatch gapopen qstart qend sstart send evalue
+#                   bitscore qlen slen'. With -outfmt 7, the '# Fields:' line is used if this option
+#                   is not specified. (default: std)
+# -P, --program STR: the blast program of the tabular input, e.g. BLASTN. With -outfmt 7, the
+#                    comment lines are used if this option is not specified.
+# --flush-rows NUM: flush the output file every NUM rows. If NUM is 0, the rows are written in
+#                   large blocks and the file is flushed at the end. (default: 0)
+# -z, --compress-level NUM: compression level of the output. The output is compressed if the file
+#                   name ends with .gz, .bgz, .bz2 or .zst. (default: 6 for gzip, 9 for bzip2,
+#                   3 for zstd)
+# -c, --columnar  : also write a columnar binary blastlist to the directory <output>.col. The
+#                   columns can be memory-mapped with fhandle.blastcol.columnreader. (default: false)
+# --checkpoint NUM: write a checkpoint to <output>.ckpt every NUM queries. The XML is parsed with
+#                   the streaming parser. 0 means no checkpoints. (default: 0)
+# --resume        : resume the parsing from the checkpoint of the output file, and truncate the
+#                   output written after it. If there is no checkpoint, or the output of the
+#                   checkpoint is missing, the file is parsed from the beginning. The checkpoints
+#                   are written every 1000 queries if --checkpoint is not specified.
+#                   (default: false)
+# --progress NUM  : write a progress line to stderr every NUM seconds. 0 means no progress lines.
+#                   (default: 0)
+# --metrics STR   : write the stage times, counters and rates to a JSON file at exit
 #
 # File formats:
 # * blast.xml: NCBI blast XML
+# * blast.tab: blast tabular output (-outfmt 6 or 7)
 # * output: blastlist
 #
+# Support multiple input files and Unix style pathname pattern. Each file is parsed to its own
+# blastlist, or to one blastlist with -m. For example:
+# * blastparser <chunk_1.xml> <chunk_2.xml> ... [-p NUM] [-o DIR]
+# * blastparser 'chunk_*.xml' -m -o merged.blastlist [-p NUM]
+#
+# A checkpoint records the byte offsets of the input and the output after the last checkpointed
+# <Iteration>, and the number of parsed hsps. The queries and hits found between two checkpoints
+# are appended to <output>.ckpt.sets. A preempted job can be rerun with the same command and
+# --resume. For example:
+# * blastparser <big.xml> -o big.blastlist --checkpoint 1000
+# * blastparser <big.xml> -o big.blastlist --checkpoint 1000 --resume
+#
+# The input can be compressed with gzip, bgzip, bzip2 or zstd. The codec is detected by the magic
+# bytes. -p, --process with one input file needs an uncompressed input.
+#
 # Tested:
 # * BLASTN 2.2.27+
 # * BLASTX 2.2.27+
 # * BLASTP 2.2.27+
 
 from __future__ import division
+import os
 import sys
+import json
+import shutil
 import argparse
 import string
 import random
-import time
-import datetime
+from multiprocessing import Pool
 from Bio.Blast import NCBIXML
+from fhandle import blastxml, blasttab, blastcol, blastlist, logmsg, name, writer, zfile
+from alignment import best
 
 
-class message:
-    def __init__(self, prog=None, cmd=None):
-        self.prog = prog
-        self.cmd = cmd
-        self.stime = time.time()
-        self.asctime = time.asctime()
+def genid(size=6, chars=string.ascii_uppercase + string.digits):
+    random.seed()
+    return ''.join(random.choice(chars) for i in range(size))
 
-    def start_message(self):
-        yield '# This output was generated with ' + self.prog + '.\n'
-        yield '# Command: ' + self.cmd + '\n'
-        yield '# Starting time: ' + self.asctime + '\n'
 
-    def end_message(self):
-        yield '# Successfully executed.' + '\n'
-        yield '# Elapsed time: ' + str(datetime.timedelta(seconds=round(time.time() - self.stime))) + '\n'
+def na(value):
+    """Return 'NA' for the values missing in the input, e.g. the tabular output without qlen."""
+    if value is None:
+        return 'NA'
+    return str(value)
+
+
+def percent(numerator, denominator):
+    if numerator is None or denominator is None:
+        return 'NA'
+    return str(round(numerator / denominator * 100, 2))
+
+
+def to_row(blast_record, alignment, hsp, aln_rank, aln_hspno):
+    """Return the blastlist columns of the hsp."""
+    row = [str(aln_rank),
+           str(aln_hspno),
+           blast_record.application,
+           blast_record.query,
+           alignment.hit_id,
+           na(blast_record.query_length),
+           str(hsp.query_start),
+           str(hsp.query_end)]
+
+    if blast_record.application in ('BLASTN'):
+        """Fix the missed value in XML output generated with BLASTN 2.2.27+"""
+        row.append(na(hsp.frame[0]))  # The strand
+        row.append('NA')              # The frame should be NA
+    else:
+        if hsp.strand[0] is None:
+            row.append('NA')
+        else:
+            row.append(str(hsp.strand[0]))
+        row.append(na(hsp.frame[0]))
+
+    row.extend([na(alignment.length),
+                str(hsp.sbjct_start),
+                str(hsp.sbjct_end)])
+
+    if blast_record.application in ('BLASTN'):
+        """Fix the missed value in XML output generated with BLASTN 2.2.27+"""
+        row.append(na(hsp.frame[1]))  # The strand
+        row.append('NA')              # The frame should be NA
+    else:
+        if hsp.strand[1] is None:
+            row.append('NA')
+        else:
+            row.append(str(hsp.strand[1]))
+        row.append(na(hsp.frame[1]))
+
+    if isinstance(hsp.gaps, tuple):
+        # Hsp_gaps is left out of the XML output without gaps, and the default is (None, None)
+        gaps = None
+    else:
+        gaps = hsp.gaps
+
+    row.extend([na(hsp.score),
+                na(hsp.bits),
+                str(hsp.expect),
+                na(hsp.align_length),
+                na(gaps),
+                na(hsp.identities),
+                percent(hsp.identities, hsp.align_length),
+                na(hsp.positives),
+                percent(hsp.positives, hsp.align_length),
+                percent(abs(hsp.query_end - hsp.query_start) + 1, blast_record.query_length),
+                percent(abs(hsp.sbjct_end - hsp.sbjct_start) + 1, alignment.length),
+                alignment.title])
+
+    return row
+
+
+def write_records(blast_records, args, fw, col=None, log=None):
+    """Write the hsps of the records. Return the sets of parsed queries and hits, and the number
+    of parsed hsps. The rows are also written to the columnar writer col if it is not None, and the
+    records and hsps are counted in the message log if it is not None."""
+    query_set = set()
+    hit_set = set()
+    hsp_num = 0
+
+    for blast_record in blast_records:
+        aln_rank = 0
+
+        if log is not None:
+            log.count('records')
+
+        if len(blast_record.alignments) == 0:
+            continue
+
+        if args.best_hit is True:
+            alignments = best.top_hsps(blast_record, args.best_num, args.best_key, args.ev_thresh)
+        else:
+            alignments = [(alignment, alignment.hsps) for alignment in blast_record.alignments]
 
+        for alignment, hsps in alignments:
+            aln_hspno = 0
+            aln_rank += 1
 
-def genid(size=6, chars=string.ascii_uppercase + string.digits):
-    random.seed()
-    return ''.join(random.choice(chars) for i in range(size))
+            if aln_rank <= args.aln_rank:
+                for hsp in hsps:
+                    aln_hspno += 1
+                    if hsp.expect <= args.ev_thresh:
+                        hsp_num += 1
+                        query_set.add(blast_record.query)
+                        hit_set.add(alignment.title)
+
+                        row = to_row(blast_record, alignment, hsp, aln_rank, aln_hspno)
+                        fw.write_row(row)
+
+                        if col is not None:
+                            col.write_row(row)
+
+                        if log is not None:
+                            log.count('hsps')
+
+    return query_set, hit_set, hsp_num
+
+
+def input_mode(args):
+    if args.input_format == 'xml' and args.stream is True:
+        return 'rb'
+    return 'r'
+
+
+def parse_handle(result_handle, args, fw, col=None, log=None):
+    """Parse an opened input file with the parser of the input format."""
+    if args.input_format == 'tab':
+        blast_records = blasttab.parse(result_handle, args.tab_fields, args.program)
+    elif args.stream is True:
+        blast_records = blastxml.parse(result_handle)
+    else:
+        blast_records = NCBIXML.parse(result_handle)
+
+    return write_records(blast_records, args, fw, col, log)
+
+
+def merge_parts(tasks, results, fw, col=None, log=None):
+    """Append the part files to fw in the order of the tasks, and remove them. The part file is the
+    last item of a task. The results are (queries, hits, hsps, bytes read) of the tasks. Return the
+    combined sets of parsed queries and hits, and the number of parsed hsps. The parts, hsps and
+    bytes are counted in the message log if it is not None, as each part is merged."""
+    query_set = set()
+    hit_set = set()
+    hsp_num = 0
+
+    for task, result in zip(tasks, results):
+        fw.drain()
+
+        with open(task[-1], 'r') as fin:
+            shutil.copyfileobj(fin, fw.handle)
+
+            if col is not None:
+                fin.seek(0)
+                for line in fin:
+                    col.write_row(line.rstrip('\n').split('\t'))
+
+        os.remove(task[-1])
+        query_set.update(result[0])
+        hit_set.update(result[1])
+        hsp_num += result[2]
+
+        if log is not None:
+            log.count('parts')
+            log.count('hsps', result[2])
+            log.count('bytes', result[3])
+
+    fw.flush()
+
+    return query_set, hit_set, hsp_num
+
+
+def parse_shard(task):
+    filename, start, end, head, args, shard_file = task
+
+    with writer.rowwriter(open(shard_file, 'w')) as fw:
+        return write_records(blastxml.parse_shard(filename, start, end, head), args, fw) + (end - start,)
+
+
+def parse_shards(input_file, output_file, args, fw, col=None, log=None):
+    """Split the input file at <Iteration> boundaries and parse the shards in a process pool.
+    The shard outputs are merged in query order."""
+    head, ranges = blastxml.shards(input_file, args.process_num * 4)
+    tasks = []
+
+    for i, (start, end) in enumerate(ranges):
+        tasks.append((input_file, start, end, head, args, output_file + '.shard' + str(i)))
+
+    pool = Pool(processes=args.process_num)
+    result = merge_parts(tasks, pool.imap(parse_shard, tasks), fw, col, log)
+    pool.close()
+    pool.join()
+
+    return result
+
+
+def write_head(args, fw, proglog):
+    for i in proglog.start_message():
+        fw.write(i)
+
+    fw.write('#\n')
+    fw.write('# E-value threshold: ' + str(args.ev_thresh) + '\n')
+    fw.write('# Rank: ' + str(args.aln_rank) + '\n')
+
+    if args.title is True:
+        fw.write('\n')
+        fw.write('\t'.join(blastlist.COLUMNS) + '\n')
+    else:
+        fw.write('#\n')
+        fw.write('# ' + '    '.join(blastlist.COLUMNS) + '\n\n')
+
+    fw.flush()
+
+
+def write_tail(fw, proglog, query_set, hit_set, hsp_num):
+    fw.write('\n')
+    fw.write('# Parsed queries: ' + str(len(query_set)) + '\n')
+    fw.write('# Non-redundant hits: ' + str(len(hit_set)) + '\n')
+    fw.write('# Parsed HSPs: ' + str(hsp_num) + '\n')
+    fw.write('#\n')
+
+    for i in proglog.end_message():
+        fw.write(i)
+
+
+def open_output(output_file, args):
+    return writer.rowwriter(zfile.zopen(output_file, 'w', level=args.compress_level), flush_rows=args.flush_rows)
+
+
+def open_columnar(output_file, args):
+    if args.columnar is True:
+        return blastcol.columnwriter(output_file + '.col')
+    return None
+
+
+def parse_file(input_file, output_file, args, proglog):
+    """Parse an input file to its own blastlist. Return the number of parsed hsps."""
+    with zfile.zopen(input_file, input_mode(args), counter=lambda n: proglog.count('bytes', n)) as result_handle, \
+            open_output(output_file, args) as fw:
+        write_head(args, fw, proglog)
+        col = open_columnar(output_file, args)
+
+        with proglog.stage('parse'):
+            if args.process_num > 1:
+                query_set, hit_set, hsp_num = parse_shards(input_file, output_file, args, fw, col, proglog)
+            else:
+                query_set, hit_set, hsp_num = parse_handle(result_handle, args, fw, col, proglog)
+
+        if col is not None:
+            col.close()
+
+        write_tail(fw, proglog, query_set, hit_set, hsp_num)
+
+    return hsp_num
+
+
+CHECKPOINT_QUERIES = 1000
+CHECKPOINT_OPTIONS = ('ev_thresh', 'aln_rank', 'best_hit', 'best_num', 'best_key')
+
+
+def checkpoint_name(output_file):
+    return output_file + '.ckpt'
+
+
+def checkpoint_sets_name(output_file):
+    return output_file + '.ckpt.sets'
+
+
+def save_checkpoint(output_file, state):
+    """Write the checkpoint to a temporary file and rename it, so a job killed while writing
+    leaves the last checkpoint."""
+    filename = checkpoint_name(output_file)
+
+    with open(filename + '.tmp', 'w') as fw:
+        json.dump(state, fw)
+
+    os.rename(filename + '.tmp', filename)
+
+
+def load_checkpoint(input_file, output_file, args):
+    """Return the state of the checkpoint, or None if there is no checkpoint."""
+    filename = checkpoint_name(output_file)
+
+    if not os.path.exists(filename):
+        return None
+
+    with open(filename, 'r') as fin:
+        state = json.load(fin)
+
+    if state['input_file'] != os.path.abspath(input_file) or state['input_size'] != os.path.getsize(input_file):
+        sys.exit('The checkpoint ' + filename + ' does not match the input file ' + input_file + '.')
+
+    for option in CHECKPOINT_OPTIONS:
+        if state['options'][option] != getattr(args, option):
+            sys.exit('The checkpoint ' + filename + ' was written with different options (' + option + ').')
+
+    return state
+
+
+def check_resumable(output_file, state):
+    """Return the reason the output of the checkpoint cannot be resumed, or None if it can."""
+    for filename, offset in ((output_file, state['output_offset']),
+                             (checkpoint_sets_name(output_file), state['sets_offset'])):
+        if not os.path.exists(filename):
+            return filename + ' is missing'
+
+        if os.path.getsize(filename) < offset:
+            return filename + ' is shorter than the checkpoint'
+
+    return None
+
+
+def load_checkpoint_sets(output_file, state):
+    """Truncate the sets file of the checkpoint to the checkpoint, and return the sets of queries
+    and hits in it."""
+    query_set = set()
+    hit_set = set()
+
+    with open(checkpoint_sets_name(output_file), 'r+') as fin:
+        fin.truncate(state['sets_offset'])
+
+        for line in fin:
+            queries, hits = json.loads(line)
+            query_set.update(queries)
+            hit_set.update(hits)
+
+    return query_set, hit_set
+
+
+def parse_resumable(input_file, output_file, args, proglog):
+    """Parse an input file with the streaming parser, and write a checkpoint every args.checkpoint
+    queries. With args.resume, the parsing restarts after the last checkpointed <Iteration>, and
+    the partial output written after the checkpoint is truncated. If the output of the checkpoint is
+    missing, the file is parsed from the beginning. Return the number of parsed hsps.
+
+    The queries and hits found since the previous checkpoint are appended to <output>.ckpt.sets as
+    a JSON line, so a checkpoint does not write the sets again."""
+    state = None
+
+    if args.resume is True:
+        state = load_checkpoint(input_file, output_file, args)
+
+        if state is not None and check_resumable(output_file, state) is not None:
+            sys.stderr.write('Cannot resume ' + input_file + ': ' + check_resumable(output_file, state) +
+                             '. Parse from the beginning.\n')
+            state = None
+
+    if state is None:
+        state = {'input_file': os.path.abspath(input_file),
+                 'input_size': os.path.getsize(input_file),
+                 'options': dict((option, getattr(args, option)) for option in CHECKPOINT_OPTIONS),
+                 'header': None,
+                 'input_offset': 0,
+                 'output_offset': 0,
+                 'sets_offset': 0,
+                 'hsp_num': 0}
+
+        fw = open_output(output_file, args)
+        write_head(args, fw, proglog)
+        query_set = set()
+        hit_set = set()
+        open(checkpoint_sets_name(output_file), 'w').close()
+    else:
+        with open(output_file, 'r+b') as fout:
+            fout.truncate(state['output_offset'])
+
+        fw = writer.rowwriter(open(output_file, 'a'), flush_rows=args.flush_rows)
+        query_set, hit_set = load_checkpoint_sets(output_file, state)
+        sys.stderr.write('Resume ' + input_file + ' at byte ' + str(state['input_offset']) + '\n')
+
+    hsp_num = state['hsp_num']
+    # The queries and hits found since the last checkpoint
+    new_queries = set()
+    new_hits = set()
+    head = blastxml.header()
+
+    if state['header'] is not None:
+        head.application, head.query, head.query_length = state['header']
+
+    record_num = 0
+
+    with open(input_file, 'rb') as result_handle, fw, open(checkpoint_sets_name(output_file), 'a') as fw_sets, \
+            proglog.stage('parse'):
+        result_handle.seek(state['input_offset'])
+
+        for start, end, data in blastxml.iterations(result_handle, offset=state['input_offset']):
+            proglog.count('bytes', len(data))
+
+            if start is None:
+                if state['header'] is None:
+                    head = blastxml.header(data)
+                    state['header'] = (head.application, head.query, head.query_length)
+                continue
+
+            result = write_records([blastxml.to_record(data, head)], args, fw, log=proglog)
+            new_queries.update(result[0] - query_set)
+            new_hits.update(result[1] - hit_set)
+            query_set.update(result[0])
+            hit_set.update(result[1])
+            hsp_num += result[2]
+            record_num += 1
+
+            if record_num % args.checkpoint == 0:
+                fw.flush()
+                fw_sets.write(json.dumps([sorted(new_queries), sorted(new_hits)]) + '\n')
+                fw_sets.flush()
+                new_queries = set()
+                new_hits = set()
+                state['input_offset'] = end
+                state['output_offset'] = fw.handle.tell()
+                state['sets_offset'] = fw_sets.tell()
+                state['hsp_num'] = hsp_num
+                save_checkpoint(output_file, state)
+
+        write_tail(fw, proglog, query_set, hit_set, hsp_num)
+
+    for filename in (checkpoint_name(output_file), checkpoint_sets_name(output_file)):
+        if os.path.exists(filename):
+            os.remove(filename)
+
+    return hsp_num
+
+
+def parse_file_task(task):
+    """Return the number of parsed hsps and bytes read of parse_file."""
+    input_file, output_file, args, cmd = task
+    proglog = logmsg.message(prog='blastparser', cmd=cmd)
+    hsp_num = parse_file(input_file, output_file, args, proglog)
+    return hsp_num, proglog.counters.get('bytes', 0)
+
+
+def parse_part(task):
+    input_file, args, part_file = task
+    bytes_read = [0]
+
+    def counter(n):
+        bytes_read[0] += n
+
+    with zfile.zopen(input_file, input_mode(args), counter=counter) as result_handle, \
+            writer.rowwriter(open(part_file, 'w')) as fw:
+        return parse_handle(result_handle, args, fw) + (bytes_read[0],)
+
+
+def parse_merged(args, proglog, pool_size):
+    """Parse the input files in a process pool, and merge the rows into one blastlist in the order
+    of the input files."""
+    tasks = []
+
+    for i, input_file in enumerate(args.input_files):
+        tasks.append((input_file, args, args.output_file + '.part' + str(i)))
+
+    with open_output(args.output_file, args) as fw:
+        write_head(args, fw, proglog)
+        col = open_columnar(args.output_file, args)
+
+        with proglog.stage('parse'):
+            pool = Pool(processes=pool_size)
+            query_set, hit_set, hsp_num = merge_parts(tasks, pool.imap(parse_part, tasks), fw, col, proglog)
+            pool.close()
+            pool.join()
+
+        if col is not None:
+            col.close()
+
+        write_tail(fw, proglog, query_set, hit_set, hsp_num)
+
+
+def parse_batch(args, proglog, pool_size):
+    """Parse each input file to its own blastlist in a process pool."""
+    tasks = []
+
+    if args.output_file is not None:
+        # The inputs with the same basename in different directories, e.g. the chunks of array jobs,
+        # are written to the subdirectories of their relative paths
+        try:
+            output_files = name.batch_outputs(args.input_files, args.output_file, '.blastlist')
+        except ValueError as e:
+            sys.exit(str(e))
+
+    for i, input_file in enumerate(args.input_files):
+        if args.output_file is None:
+            output_file = input_file + '_out_' + genid() + '.blastlist'
+        else:
+            output_file = output_files[i]
+
+            if not os.path.exists(os.path.dirname(output_file)):
+                os.makedirs(os.path.dirname(output_file))
+        tasks.append((input_file, output_file, args, proglog.cmd))
+
+    with proglog.stage('parse'):
+        pool = Pool(processes=pool_size)
+
+        for task, (hsp_num, bytes_read) in zip(tasks, pool.imap(parse_file_task, tasks)):
+            sys.stderr.write(task[0] + ' -> ' + task[1] + ': ' + str(hsp_num) + ' HSPs\n')
+            proglog.count('files')
+            proglog.count('hsps', hsp_num)
+            proglog.count('bytes', bytes_read)
+
+        pool.close()
+        pool.join()
 
 
 def main():
-    proglog = message(prog='blastparser', cmd=' '.join(sys.argv))
+    proglog = logmsg.message(prog='blastparser', cmd=' '.join(sys.argv))
 
     parser = argparse.ArgumentParser(description='blastparser - Parse the blast output file')
-    parser.add_argument('input_file')
+    parser.add_argument('input_files', nargs='+')
     parser.add_argument('-e', '--evalue', dest='ev_thresh', type=float, default=0.01,
                         help='evalue thresh (default: 0.01)')
     parser.add_argument('-r', '--rank', dest='aln_rank', type=int, default=250,
                         help='alignment rank (default: 250)')
     parser.add_argument('-o', '--output', dest='output_file',
                         help='output file name. If this option is not specified, the script will generate '
-                        'one with unique identifier at current directory.')
+                        'one with unique identifier at current directory. With multiple input files, it is '
+                        'the output directory unless -m is specified, and the outputs keep the paths of the inputs '
+                        'relative to their common directory.')
+    parser.add_argument('-m', '--merge', dest='merge', action='store_true', default=False,
+                        help='merge the results of multiple input files into one output file with combined '
+                        'counts (default: false)')
     parser.add_argument('-b', '--best', dest='best_hit', action='store_true', default=False,
                         help='filter results with best selection. If this option is specified, the script '
-                        'will select one best hsp for each query with the following criteria. The -r, '
-                        '--rank option will be useless. (default: false) '
-                        'Criteria: (order by number) '
+                        'will select -n best hsps for each query with the criteria of -k. The -r, '
+                        '--rank option will be useless. (default: false)')
+    parser.add_argument('-n', '--best-num', dest='best_num', type=int, default=1,
+                        help='number of best hsps for each query with -b (default: 1)')
+    parser.add_argument('-k', '--best-key', dest='best_key', choices=sorted(best.CRITERIA), default='evalue',
+                        help='criteria of the best selection. '
+                        'evalue: (order by number) '
                         ' 1. Lowest E-value '
                         ' 2. Highest Identity percent'
                         ' 3. Highest Hsp length'
-                        ' 4. The first hit')
+                        ' 4. The first hit. '
+                        'bitscore: Highest bit score, then lowest E-value. '
+                        'identity: Highest identity percent, then lowest E-value. '
+                        'coverage: Highest query coverage, then lowest E-value. (default: evalue)')
     parser.add_argument('-t', '--title', dest='title', action='store_true', default=False,
                         help='print header (default: false)')
+    parser.add_argument('-s', '--stream', dest='stream', action='store_true', default=False,
+                        help='parse the XML with the streaming parser instead of Bio.Blast.NCBIXML. The '
+                        'alignment strings are skipped, so it is faster and uses less memory on large files. '
+                        'The output is the same. (default: false)')
+    parser.add_argument('-p', '--process', dest='process_num', type=int, default=1,
+                        help='number of processes (CPUs) to use. If NUM > 1, the input file is split at '
+                        '<Iteration> boundaries and the shards are parsed in parallel with the streaming '
+                        'parser. With multiple input files, the files are parsed in parallel instead. '
+                        '(default: 1)')
+    parser.add_argument('-f', '--format', dest='input_format', choices=['xml', 'tab'], default='xml',
+                        help='input format. \'xml\' for the NCBI blast XML, \'tab\' for the blast tabular output '
+                        '(-outfmt 6 or 7). The tabular input fills in the columns it has, and the others are '
+                        'written as NA. (default: xml)')
+    parser.add_argument('-F', '--fields', dest='tab_fields',
+                        help='the columns of the tabular input with the names of -outfmt 6. With -outfmt 7, the '
+                        '\'# Fields:\' line is used if this option is not specified. (default: std)')
+    parser.add_argument('-P', '--program', dest='program',
+                        help='the blast program of the tabular input, e.g. BLASTN. With -outfmt 7, the comment '
+                        'lines are used if this option is not specified.')
+    parser.add_argument('--flush-rows', dest='flush_rows', type=int, default=0,
+                        help='flush the output file every NUM rows. If NUM is 0, the rows are written in '
+                        'large blocks and the file is flushed at the end. (default: 0)')
+    parser.add_argument('-c', '--columnar', dest='columnar', action='store_true', default=False,
+                        help='also write a columnar binary blastlist to the directory <output>.col. The columns '
+                        'can be memory-mapped with fhandle.blastcol.columnreader. (default: false)')
+    parser.add_argument('-z', '--compress-level', dest='compress_level', type=int,
+                        help='compression level of the output. The output is compressed if the file name ends '
+                        'with .gz, .bgz, .bz2 or .zst. (default: 6 for gzip, 9 for bzip2, 3 for zstd)')
+    parser.add_argument('--checkpoint', dest='checkpoint', type=int, default=0,
+                        help='write a checkpoint to <output>.ckpt every NUM queries. The XML is parsed with the '
+                        'streaming parser. 0 means no checkpoints. (default: 0)')
+    parser.add_argument('--resume', dest='resume', action='store_true', default=False,
+                        help='resume the parsing from the checkpoint of the output file, and truncate the '
+                        'output written after it. If there is no checkpoint, or the output of the checkpoint '
+                        'is missing, the file is parsed from the beginning. The checkpoints are written '
+                        'every ' + str(CHECKPOINT_QUERIES) + ' queries if --checkpoint is not specified. '
+                        '(default: false)')
+    logmsg.add_arguments(parser)
     args = parser.parse_args()
+    args.input_files = name.expand(args.input_files)
+    proglog.setup(args.progress, args.metrics)
 
-    if args.best_hit is True:
-        args.aln_rank = 1
-
-    if args.output_file is None:
-        args.output_file = args.input_file + '_out_' + genid() + '.blastlist'
-
-    with open(args.input_file, 'r') as result_handle, open(args.output_file, 'w') as fw:
-        for i in proglog.start_message():
-            fw.write(i)
-
-        header = ('aln_rank',
-                  'aln_hspno',
-                  'aln_method',
-                  'query_name',
-                  'hit_name',
-                  'query_length',
-                  'query_hsp_start',
-                  'query_hsp_end',
-                  'query_strand',
-                  'query_frame',
-                  'hit_length',
-                  'hit_hsp_start',
-                  'hit_hsp_end',
-                  'hit_strand',
-                  'hit_frame',
-                  'hsp_score',
-                  'hsp_bits',
-                  'hsp_evalue',
-                  'hsp_length',
-                  'hsp_gaps',
-                  'hsp_identities',
-                  'hsp_identity_percent',
-                  'hsp_positives',
-                  'hsp_positive_percent',
-                  'query_coverage',
-                  'hit_coverage',
-                  'hit_description')
+    if len(args.input_files) == 0:
+        parser.error('no input files')
 
-        fw.write('#\n')
-        fw.write('# E-value threshold: ' + str(args.ev_thresh) + '\n')
-        fw.write('# Rank: ' + str(args.aln_rank) + '\n')
+    if len(args.input_files) == 1 and args.process_num > 1:
+        if args.input_format == 'tab':
+            parser.error('-p, --process only supports the XML input')
 
-        if args.title is True:
-            fw.write('\n')
-            fw.write('\t'.join(header) + '\n')
-        else:
-            fw.write('#\n')
-            fw.write('# ' + '    '.join(header) + '\n\n')
+        if zfile.detect(args.input_files[0]) is not None:
+            parser.error('-p, --process needs an uncompressed input file')
 
-        fw.flush()
+    if args.resume is True and args.checkpoint == 0:
+        args.checkpoint = CHECKPOINT_QUERIES
 
-        blast_records = NCBIXML.parse(result_handle)
-        query_set = set()
-        hit_set = set()
-        hsp_num = 0
+    if args.checkpoint > 0:
+        if len(args.input_files) > 1 or args.process_num > 1:
+            parser.error('--checkpoint and --resume support one input file with one process')
 
-        for blast_record in blast_records:
-            aln_rank = 0
+        if args.input_format != 'xml' or zfile.detect(args.input_files[0]) is not None:
+            parser.error('--checkpoint and --resume need an uncompressed XML input file')
 
-            if len(blast_record.alignments) == 0:
-                continue
+        if args.output_file is None:
+            parser.error('--checkpoint and --resume need the output file name (-o)')
 
-            alignments = blast_record.alignments
-
-            if args.best_hit is True:
-                hspmap = {}
-                hsps = []
-
-                for alignment in alignments:
-                    for hsp in alignment.hsps:
-                        hspmap.update({hsp: alignment})
-                        hsps.append(hsp)
-
-                hsps.sort(key=lambda s: (s.expect, -(s.identities / s.align_length), -s.align_length))
-                hspmap[hsps[0]].hsps = [hsps[0]]
-                alignments = [hspmap[hsps[0]]]
-
-            for alignment in alignments:
-                aln_hspno = 0
-                aln_rank += 1
-
-                if aln_rank <= args.aln_rank:
-                    for hsp in alignment.hsps:
-                        aln_hspno += 1
-                        if hsp.expect <= args.ev_thresh:
-                            hsp_num += 1
-                            query_set.add(blast_record.query)
-                            hit_set.add(alignment.title)
-
-                            fw.write(str(aln_rank) + '\t')
-                            fw.write(str(aln_hspno) + '\t')
-                            fw.write(blast_record.application + '\t')
-                            fw.write(blast_record.query + '\t')
-                            fw.write(alignment.hit_id + '\t')
-                            fw.write(str(blast_record.query_length) + '\t')
-                            fw.write(str(hsp.query_start) + '\t')
-                            fw.write(str(hsp.query_end) + '\t')
-
-                            if blast_record.application in ('BLASTN'):
-                                """Fix the missed value in XML output generated with BLASTN 2.2.27+"""
-                                fw.write(str(hsp.frame[0]) + '\t')  # The strand
-                                fw.write('NA\t')                    # The frame should be NA
-                            else:
-                                if hsp.strand[0] is None:
-                                    fw.write('NA\t')
-                                else:
-                                    fw.write(str(hsp.strand[0]) + '\t')
-                                fw.write(str(str(hsp.frame[0]) + '\t'))
-
-                            fw.write(str(alignment.length) + '\t')
-                            fw.write(str(hsp.sbjct_start) + '\t')
-                            fw.write(str(hsp.sbjct_end) + '\t')
-
-                            if blast_record.application in ('BLASTN'):
-                                """Fix the missed value in XML output generated with BLASTN 2.2.27+"""
-                                fw.write(str(hsp.frame[1]) + '\t')  # The strand
-                                fw.write('NA\t')                    # The frame should be NA
-                            else:
-                                if hsp.strand[1] is None:
-                                    fw.write('NA\t')
-                                else:
-                                    fw.write(str(hsp.strand[1] + '\t'))
-                                fw.write(str(str(hsp.frame[1])) + '\t')
-
-                            fw.write(str(hsp.score) + '\t')
-                            fw.write(str(hsp.bits) + '\t')
-                            fw.write(str(hsp.expect) + '\t')
-                            fw.write(str(hsp.align_length) + '\t')
-                            fw.write(str(hsp.gaps) + '\t')
-                            fw.write(str(hsp.identities) + '\t')
-                            fw.write(str(round(hsp.identities / hsp.align_length * 100, 2)) + '\t')
-                            fw.write(str(hsp.positives) + '\t')
-                            fw.write(str(round(hsp.positives / hsp.align_length * 100, 2)) + '\t')
-                            fw.write(str(round((abs(hsp.query_end - hsp.query_start) + 1) / blast_record.query_length * 100, 2)) + '\t')
-                            fw.write(str(round((abs(hsp.sbjct_end - hsp.sbjct_start) + 1) / alignment.length * 100, 2)) + '\t')
-                            fw.write(alignment.title + '\n')
-                            fw.flush()
+        if zfile.codec_of_name(args.output_file) is not None or args.columnar is True:
+            parser.error('--checkpoint and --resume need an uncompressed output file without -c')
 
-        fw.write('\n')
-        fw.write('# Parsed queries: ' + str(len(query_set)) + '\n')
-        fw.write('# Non-redundant hits: ' + str(len(hit_set)) + '\n')
-        fw.write('# Parsed HSPs: ' + str(hsp_num) + '\n')
-        fw.write('#\n')
+    if args.tab_fields is not None:
+        args.tab_fields = tuple(args.tab_fields.split())
 
-        for i in proglog.end_message():
-            fw.write(i)
+    if args.program is not None:
+        args.program = args.program.upper()
+
+    if args.best_num < 1:
+        parser.error('-n/--best-num must be at least 1')
+
+    if args.best_hit is True:
+        args.aln_rank = args.best_num
+
+    if len(args.input_files) == 1:
+        if args.output_file is None:
+            args.output_file = args.input_files[0] + '_out_' + genid() + '.blastlist'
+
+        if args.checkpoint > 0:
+            parse_resumable(args.input_files[0], args.output_file, args, proglog)
+        else:
+            parse_file(args.input_files[0], args.output_file, args, proglog)
+    else:
+        # The files are parsed in parallel, and each file is parsed by one process
+        pool_size = args.process_num
+        args.process_num = 1
+
+        if args.merge is True:
+            if args.output_file is None:
+                args.output_file = args.input_files[0] + '_out_' + genid() + '.blastlist'
+
+            parse_merged(args, proglog, pool_size)
+        else:
+            parse_batch(args, proglog, pool_size)
 
 if __name__ == '__main__':
     main()
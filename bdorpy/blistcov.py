@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+#
+# blistcov - Compute the union coverage of the hsps in the blastlist
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# Requirement:
+# * NumPy: http://www.numpy.org
+#
+# Usage: blistcov <input.blastlist> [options]
+#
+# Options:
+# -o, --output     STR: output file of the query coverage. If this option is not specified, it is
+#                       written to the standard output.
+# -H, --hit-output STR: output file of the coverage of each query and hit pair.
+# --progress       NUM: write a progress line to stderr every NUM seconds. 0 means no progress
+#                       lines. (default: 0)
+# --metrics        STR: write the stage times, counters and rates to a JSON file at exit
+#
+# File formats:
+# * input.blastlist: blastlist. The hsps of a query must be consecutive, as blastparser writes them.
+# * output: query_name, query_length, hit_num, hsp_num, covered_length, coverage, gaps
+# * hit output: query_name, hit_name, query_length, hit_length, hsp_num, query_covered_length,
+#               query_coverage, hit_covered_length, hit_coverage, query_gaps
+#
+# The hsp intervals are merged per query and per query and hit pair, so the positions covered by
+# more than one hsp are counted once. The coverage is a percentage of the sequence length, and the
+# gaps are the uncovered intervals, e.g. 1-20,301-650 ('-' if there are none). Without the sequence
+# length, the coverage is NA and the gaps are the ones between the covered intervals.
+
+import sys
+import argparse
+import itertools
+from collections import OrderedDict
+from alignment import calculate
+from fhandle import blastlist, writer, zfile, logmsg
+
+QUERY_COLUMNS = ('query_name', 'query_length', 'hit_num', 'hsp_num', 'covered_length', 'coverage', 'gaps')
+HIT_COLUMNS = ('query_name', 'hit_name', 'query_length', 'hit_length', 'hsp_num', 'query_covered_length',
+               'query_coverage', 'hit_covered_length', 'hit_coverage', 'query_gaps')
+
+
+def na(value):
+    if value is None:
+        return 'NA'
+    return str(value)
+
+
+def percent(numerator, denominator):
+    if denominator is None:
+        return 'NA'
+    return str(round(numerator / float(denominator) * 100, 2))
+
+
+def format_gaps(positions, length):
+    if length is None:
+        merged = calculate.merge_intervals(positions)
+        gaps = calculate.get_gaps(merged, merged[0][0], merged[-1][1])
+    else:
+        gaps = calculate.get_gaps(positions, 1, length)
+
+    if len(gaps) == 0:
+        return '-'
+
+    return ','.join(str(start) + '-' + str(end) for start, end in gaps)
+
+
+def get_query_hsps(records):
+    """Yield (query_name, query_length, hits) of the consecutive records of each query. hits is an
+    OrderedDict of hit name to [hit_length, query positions, hit positions]."""
+    seen = set()
+
+    for query_name, query_records in itertools.groupby(records, key=lambda rec: rec.query_name):
+        if query_name in seen:
+            raise ValueError('The hsps of query ' + query_name + ' are not consecutive in the blastlist.')
+        seen.add(query_name)
+
+        query_length = None
+        hits = OrderedDict()
+
+        for rec in query_records:
+            if rec.query_length is not None:
+                query_length = rec.query_length
+
+            if rec.hit_name not in hits:
+                hits[rec.hit_name] = [rec.hit_length, [], []]
+
+            hit = hits[rec.hit_name]
+            hit[1].append((rec.query_hsp_start, rec.query_hsp_end))
+
+            if rec.hit_hsp_start is not None and rec.hit_hsp_end is not None:
+                hit[2].append((rec.hit_hsp_start, rec.hit_hsp_end))
+
+        yield query_name, query_length, hits
+
+
+def main():
+    proglog = logmsg.message(prog='blistcov', cmd=' '.join(sys.argv))
+
+    parser = argparse.ArgumentParser(description='blistcov - Compute the union coverage of the hsps in the '
+                                     'blastlist')
+    parser.add_argument('input_file')
+    parser.add_argument('-o', '--output', dest='output_file',
+                        help='output file of the query coverage. If this option is not specified, it is written '
+                        'to the standard output.')
+    parser.add_argument('-H', '--hit-output', dest='hit_output_file',
+                        help='output file of the coverage of each query and hit pair.')
+    logmsg.add_arguments(parser)
+    args = parser.parse_args()
+    proglog.setup(args.progress, args.metrics)
+
+    if args.output_file is None:
+        fw = writer.rowwriter(sys.stdout)
+    else:
+        fw = writer.rowwriter(open(args.output_file, 'w'))
+
+    fw.write('\t'.join(QUERY_COLUMNS) + '\n')
+
+    if args.hit_output_file is not None:
+        fw_hit = writer.rowwriter(open(args.hit_output_file, 'w'))
+        fw_hit.write('\t'.join(HIT_COLUMNS) + '\n')
+    else:
+        fw_hit = None
+
+    with zfile.zopen(args.input_file, 'r') as fin, proglog.stage('coverage'):
+        for query_name, query_length, hits in get_query_hsps(blastlist.parse(fin)):
+            query_positions = []
+
+            for hit_name, (hit_length, hit_query_positions, hit_positions) in hits.items():
+                query_positions.extend(hit_query_positions)
+
+                if fw_hit is not None:
+                    query_covered = calculate.covered_length(hit_query_positions)
+                    hit_covered = calculate.covered_length(hit_positions)
+                    fw_hit.write_row([query_name,
+                                      hit_name,
+                                      na(query_length),
+                                      na(hit_length),
+                                      str(len(hit_query_positions)),
+                                      str(query_covered),
+                                      percent(query_covered, query_length),
+                                      str(hit_covered),
+                                      percent(hit_covered, hit_length),
+                                      format_gaps(hit_query_positions, query_length)])
+
+            covered = calculate.covered_length(query_positions)
+            fw.write_row([query_name,
+                          na(query_length),
+                          str(len(hits)),
+                          str(len(query_positions)),
+                          str(covered),
+                          percent(covered, query_length),
+                          format_gaps(query_positions, query_length)])
+
+            proglog.count('queries')
+            proglog.count('hsps', len(query_positions))
+
+    if args.output_file is None:
+        fw.flush()
+    else:
+        fw.close()
+
+    if fw_hit is not None:
+        fw_hit.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+#
+# blistidx - Index the blastlist by query and extract the hsps of queries
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# Usage: blistidx <input.blastlist> [options]
+#
+# Options:
+# -q, --query  STR: query names to extract. This option can be specified multiple times.
+# -l, --list   STR: file of query names to extract, one name per line.
+# -o, --output STR: output file name. If this option is not specified, the hsps are written to the
+#                   standard output.
+# -b, --build     : rebuild the index even if it matches the blastlist (default: false)
+# --progress   NUM: write a progress line to stderr every NUM seconds. 0 means no progress lines.
+#                   (default: 0)
+# --metrics    STR: write the stage times, counters and rates to a JSON file at exit
+#
+# File formats:
+# * input.blastlist: blastlist (uncompressed)
+# * index: <input.blastlist>.qidx
+#
+# The index is built at the first run, and the following runs seek to the hsps of the queries
+# without scanning the blastlist. Without -q and -l, the script only builds the index.
+
+import sys
+import argparse
+from fhandle import blastidx, lists, writer, logmsg
+
+
+def main():
+    proglog = logmsg.message(prog='blistidx', cmd=' '.join(sys.argv))
+
+    parser = argparse.ArgumentParser(description='blistidx - Index the blastlist by query and extract the hsps '
+                                     'of queries')
+    parser.add_argument('input_file')
+    parser.add_argument('-q', '--query', dest='queries', action='append', default=[],
+                        help='query names to extract. This option can be specified multiple times.')
+    parser.add_argument('-l', '--list', dest='query_list',
+                        help='file of query names to extract, one name per line.')
+    parser.add_argument('-o', '--output', dest='output_file',
+                        help='output file name. If this option is not specified, the hsps are written to the '
+                        'standard output.')
+    parser.add_argument('-b', '--build', dest='build', action='store_true', default=False,
+                        help='rebuild the index even if it matches the blastlist (default: false)')
+    logmsg.add_arguments(parser)
+    args = parser.parse_args()
+    proglog.setup(args.progress, args.metrics)
+
+    with proglog.stage('index'):
+        if args.build is True:
+            index = blastidx.build(args.input_file)
+        else:
+            index = blastidx.load(args.input_file)
+
+        proglog.count('queries', len(index))
+
+    queries = list(args.queries)
+
+    if args.query_list is not None:
+        queries.extend(q for q in lists.to_list(args.query_list) if q != '')
+
+    if len(queries) == 0:
+        sys.stderr.write('# Indexed queries: ' + str(len(index)) + '\n')
+        return
+
+    if args.output_file is None:
+        fw = writer.rowwriter(sys.stdout)
+    else:
+        fw = writer.rowwriter(open(args.output_file, 'w'))
+
+    missing = [q for q in queries if q not in index]
+
+    with proglog.stage('fetch'):
+        for line in blastidx.fetch(args.input_file, queries, index):
+            fw.write(line)
+            proglog.count('hsps')
+
+    if args.output_file is None:
+        fw.flush()
+    else:
+        fw.close()
+
+    if missing:
+        sys.stderr.write('# Queries not found: ' + str(len(missing)) + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,7 @@
 # Created: 2013.1.31
 #
 # Requirement:
-# * Biopython: http://biopython.org
+# * NumPy (optional, faster translation): http://www.numpy.org
 #
 # Usage: -b <blastlist> -f <fasta> [options]
 #
@@ -21,10 +21,18 @@
 # -o, --output-directory STR: output directory. If this option is not specified, the script will generate
 #                             one with unique identifier at current directory.
 # -p, --process          NUM: number of threads (CPUs) to use (default: 1)
+# -P, --pack                : write the fasta files of the hits into one container <output>/msainput.pack
+#                             instead of a file per hit in <output>/msainput. Use msapack to extract
+#                             the files. (default: false)
+# --progress             NUM: write a progress line to stderr every NUM seconds. 0 means no progress
+#                             lines. (default: 0)
+# --metrics              STR: write the stage times, counters and rates to a JSON file at exit
 #
 # File formats:
 # <blastlist>: blastlist
 # <fasta>: fasta
+# <output>/sequences.store: the sequences of the fasta files packed for the worker processes
+# <output>/msainput.pack: the fasta files of the hits in a container (fhandle.pack), with -P
 #
 # -b and -f options support multiple input files and Unix style pathname pattern.
 # For example:
@@ -38,10 +46,43 @@ import re
 import sys
 import argparse
 import ConfigParser
-from subprocess import Popen, PIPE
 from multiprocessing import Pool
-from Bio import SeqIO
-from fhandle import name, logmsg
+from alignment import translate
+from fhandle import name, logmsg, writer, zfile, blastlist, seqstore, extsort, pack
+
+# The order of hsps of a hit: evalue, identity percent, hsp length, hit coverage and query length
+SORT_KEYS = ('5d', '18g', '22gr', '19gr', '26gr', '6gr')
+
+# Number of hits sent to a worker at a time with -P
+PACK_CHUNK = 100
+
+_sort_key = extsort.key_function(SORT_KEYS)
+_translator = None
+
+
+def add_candidate(candidates, rec, groups):
+    """Keep the hsp if it can be picked for a common hit. For each hit name, the hsps of queries
+    that match the same groups are picked no more than once, the first one in the order of
+    SORT_KEYS and then the whole line, so only the best one is kept. The hsps of queries that match
+    no group are all kept."""
+    signature = tuple(i for i, names in enumerate(groups) if any(n in rec.query_name for n in names))
+    hit = candidates.setdefault(rec.hit_name, {})
+    candidate = (_sort_key(rec.line), rec.line)
+
+    if len(signature) == 0:
+        hit.setdefault(signature, []).append(candidate)
+    elif signature not in hit or candidate < hit[signature]:
+        hit[signature] = candidate
+
+
+def get_candidates(candidates):
+    for hit in candidates.values():
+        for signature, candidate in hit.items():
+            if len(signature) == 0:
+                for item in candidate:
+                    yield item
+            else:
+                yield candidate
 
 
 def main():
@@ -57,12 +98,21 @@ def main():
                         'one with unique identifier at current directory.')
     parser.add_argument('-p', '--process', dest='process_num', type=int, default=1,
                         help='number of threads (CPUs) to use')
+    parser.add_argument('-P', '--pack', dest='pack', action='store_true', default=False,
+                        help='write the fasta files of the hits into one container <output>/msainput.pack '
+                        'instead of a file per hit in <output>/msainput. Use msapack to extract the files. '
+                        '(default: false)')
+    logmsg.add_arguments(parser)
     args = parser.parse_args()
+    proglog.setup(args.progress, args.metrics)
 
     config = ConfigParser.ConfigParser()
     config.read(os.path.dirname(os.path.abspath(__file__)) + '/config/group.cfg')
 
-    if not os.path.exists(args.output.rstrip('/') + '/msainput'):
+    if args.pack is True:
+        if not os.path.exists(args.output.rstrip('/')):
+            os.makedirs(args.output.rstrip('/'))
+    elif not os.path.exists(args.output.rstrip('/') + '/msainput'):
         os.makedirs(args.output.rstrip('/') + '/msainput')
 
     fwlog = open(args.output.rstrip('.') + '/commonfa.log', 'w')
@@ -72,36 +122,39 @@ def main():
 
     fwlog.flush()
 
-    awk_cmd = "awk -F'\t' '$5 ~ /ref/ { print $0 }' " + ' '.join(args.input_files_blastlist)
-    sort_cmd = "sort -t$'\t' -k5d,5 -k18g,18 -k22gr,22 -k19gr,19 -k26gr,26 -k6gr"
-
-    fwsort = open(args.output.rstrip('/') + '/sort.temp', 'w')
-    awk_proc = Popen(awk_cmd, stdout=PIPE, executable='/bin/bash', shell=True)
-    sort_proc = Popen(sort_cmd, stdin=awk_proc.stdout, stdout=fwsort, executable='/bin/bash', shell=True)
-    sort_proc.communicate()
-    fwsort.close()
-
-    fasta = {}
-
-    for filename in args.input_files_fasta:
-        fasta.update(dict(SeqIO.index(filename, 'fasta')))
+    with proglog.stage('load_fasta'):
+        # The workers read the sequences from the packed store instead of receiving them with the tasks
+        store_file = args.output.rstrip('/') + '/sequences.store'
+        proglog.count('sequences', seqstore.build(args.input_files_fasta, store_file))
 
     susp_names = config.get('Susp', 'bdor').split(',')
     res_names = config.get('Res', 'bdor').split(',')
     rec_names = config.get('Rec', 'bdor').split(',')
-    has_susp = has_res = has_rec = False
-    commonhit = {}
 
-    hitname = re.compile('.*gi\|\d*?\|(.*?)\|(.*?)\|.*')
+    with proglog.stage('group'):
+        candidates = {}
+
+        for filename in args.input_files_blastlist:
+            with zfile.zopen(filename, 'r') as fin:
+                for rec in blastlist.parse(fin):
+                    proglog.count('hsps')
+
+                    if 'ref' in rec.hit_name:
+                        add_candidate(candidates, rec, (susp_names, res_names, rec_names))
 
-    with open(args.output.rstrip('/') + '/sort.temp', 'r') as fin:
-        for line in fin:
-            data = line.split('\t')
-            match = hitname.match(data[4])
+        has_susp = has_res = has_rec = False
+        commonhit = {}
 
-            query_name = data[3]
+        hitname = re.compile('.*gi\|\d*?\|(.*?)\|(.*?)\|.*')
+
+        # The candidates are picked in the order of the hsps sorted by SORT_KEYS
+        for sort_key, line in sorted(get_candidates(candidates)):
+            rec = blastlist.record(line)
+            match = hitname.match(rec.hit_name)
+
+            query_name = rec.query_name
             hit_name = match.group(2)
-            query_frame = int(data[9])
+            query_frame = rec.query_frame
 
             if hit_name in commonhit:
                 if any(i in query_name for i in susp_names):
@@ -141,11 +194,21 @@ def main():
 
     for hit in commonhit:
         if len(commonhit[hit]) == len(args.input_files_blastlist):
-            tasks.append((hit, commonhit[hit], fasta, args))
+            tasks.append((hit, commonhit[hit], args.output.rstrip('/'), args.pack))
             parsed_num += 1
 
-    pool = Pool(processes=args.process_num)
-    pool.map(do_parsing, tasks)
+    with proglog.stage('translate'):
+        pool = Pool(processes=args.process_num, initializer=init_worker, initargs=(store_file,))
+
+        if args.pack is True:
+            # The workers return the fasta text, and the records are written here in the order of the tasks
+            with pack.packwriter(args.output.rstrip('/') + '/msainput.pack') as fwpack:
+                for hit, text in pool.imap(do_parsing, tasks, chunksize=PACK_CHUNK):
+                    fwpack.write(hit, text)
+        else:
+            pool.map(do_parsing, tasks)
+
+        proglog.count('hits', parsed_num)
 
     fwlog.write('# Parsed hits: ' + str(parsed_num) + '\n')
 
@@ -155,20 +218,37 @@ def main():
     fwlog.flush()
 
 
+def init_worker(store_file):
+    """Open the sequence store and the translation cache of the worker."""
+    global _translator
+    seqstore.initializer(store_file)
+    _translator = translate.translator(seqstore.shared().fetch)
+
+
+def get_fasta(seqs):
+    text = []
+
+    for seq in seqs:
+        query_name, frame = seq
+
+        if frame < 0:
+            text.append('>' + query_name + '(' + str(frame) + ')\n')
+        else:
+            text.append('>' + query_name + '(+' + str(frame) + ')\n')
+
+        text.append(_translator.translate(query_name, frame) + '\n\n')
+
+    return ''.join(text)
+
+
 def do_parsing(tasks):
-    hit, seqs, fasta, args = tasks
-    with open(args.output.rstrip('/') + '/msainput/' + hit, 'w') as fw:
-        for seq in seqs:
-            query_name, frame = seq
-
-            if frame < 0:
-                fw.write('>' + query_name + '(' + str(frame) + ')\n')
-                fw.write(fasta[query_name].seq.reverse_complement()[-frame - 1:].translate().tostring() + '\n\n')
-            else:
-                fw.write('>' + query_name + '(+' + str(frame) + ')\n')
-                fw.write(fasta[query_name].seq[frame - 1:].translate().tostring() + '\n\n')
+    hit, seqs, output_dir, packed = tasks
+
+    if packed is True:
+        return hit, get_fasta(seqs)
 
-            fw.flush()
+    with writer.rowwriter(open(output_dir + '/msainput/' + hit, 'w')) as fw:
+        fw.write(get_fasta(seqs))
 
 if __name__ == '__main__':
     main()
@@ -15,6 +15,9 @@
 # Options:
 # -o, --output-directory STR: output directory. If this option is not specified, the script will generate
 #                             one with unique identifier at current directory.
+# --progress             NUM: write a progress line to stderr every NUM seconds. 0 means no progress
+#                             lines. (default: 0)
+# --metrics              STR: write the stage times, counters and rates to a JSON file at exit
 #
 # Support multiple input files and Unix style pathname pattern.
 # For example:
@@ -24,7 +27,7 @@
 import os
 import sys
 import argparse
-from fhandle import name
+from fhandle import name, logmsg
 
 
 def get_common_hitname(source):
@@ -94,12 +97,16 @@ def writefile(output_file, common_mutation_profile):
 
 
 def main():
+    proglog = logmsg.message(prog='commutate', cmd=' '.join(sys.argv))
+
     parser = argparse.ArgumentParser(description='commutate - Find the common mutation profile')
     parser.add_argument('input', nargs='*')
     parser.add_argument('-o', '--output-directory', dest='output', default='commutate_out_' + name.genid(),
                         help='output directory. If this option is not specified, the script will generate '
                         'one with unique identifier at current directory.')
+    logmsg.add_arguments(parser)
     args = parser.parse_args()
+    proglog.setup(args.progress, args.metrics)
 
     args.output = args.output.rstrip('/')
 
@@ -117,10 +124,11 @@ def main():
         source_rec_eq_susp[afile] = {}
         source_rec_eq_res[afile] = {}
 
-        with open(afile, 'r') as fin:
+        with open(afile, 'r') as fin, proglog.stage('load'):
             for line in fin:
                 if line.lstrip() == '' or line.lstrip()[0] in ('#', 'm'):
                     continue
+                proglog.count('hits')
                 data = line.rstrip().split('\t')
                 if int(data[3]) > 0:
                     source_res_eq_susp[afile].update({data[1]: set(data[9].split(','))})
@@ -129,18 +137,22 @@ def main():
                 if int(data[5]) > 0:
                     source_rec_eq_res[afile].update({data[1]: set(data[11].split(','))})
 
-    common_hitname_res_eq_susp = get_common_hitname(source_res_eq_susp)
-    common_mutation_profile_res_eq_susp = get_common_mutate(source_res_eq_susp, common_hitname_res_eq_susp)
+        proglog.count('files')
+
+    with proglog.stage('compare'):
+        common_hitname_res_eq_susp = get_common_hitname(source_res_eq_susp)
+        common_mutation_profile_res_eq_susp = get_common_mutate(source_res_eq_susp, common_hitname_res_eq_susp)
 
-    common_hitname_rec_eq_susp = get_common_hitname(source_rec_eq_susp)
-    common_mutation_profile_rec_eq_susp = get_common_mutate(source_rec_eq_susp, common_hitname_rec_eq_susp)
+        common_hitname_rec_eq_susp = get_common_hitname(source_rec_eq_susp)
+        common_mutation_profile_rec_eq_susp = get_common_mutate(source_rec_eq_susp, common_hitname_rec_eq_susp)
 
-    common_hitname_rec_eq_res = get_common_hitname(source_rec_eq_res)
-    common_mutation_profile_rec_eq_res = get_common_mutate(source_rec_eq_res, common_hitname_rec_eq_res)
+        common_hitname_rec_eq_res = get_common_hitname(source_rec_eq_res)
+        common_mutation_profile_rec_eq_res = get_common_mutate(source_rec_eq_res, common_hitname_rec_eq_res)
 
-    writefile(args.output + '/common_mutation_profile_res_eq_susp.txt', common_mutation_profile_res_eq_susp)
-    writefile(args.output + '/common_mutation_profile_rec_eq_susp.txt', common_mutation_profile_rec_eq_susp)
-    writefile(args.output + '/common_mutation_profile_rec_eq_res.txt', common_mutation_profile_rec_eq_res)
+    with proglog.stage('write'):
+        writefile(args.output + '/common_mutation_profile_res_eq_susp.txt', common_mutation_profile_res_eq_susp)
+        writefile(args.output + '/common_mutation_profile_rec_eq_susp.txt', common_mutation_profile_rec_eq_susp)
+        writefile(args.output + '/common_mutation_profile_rec_eq_res.txt', common_mutation_profile_rec_eq_res)
 
 if __name__ == "__main__":
     main()
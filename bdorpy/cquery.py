@@ -14,6 +14,9 @@
 #
 # Options:
 # -e, --evalue NUM: evalue thresh (default: 0.01)
+# --progress   NUM: write a progress line to stderr every NUM seconds. 0 means no progress lines.
+#                   (default: 0)
+# --metrics    STR: write the stage times, counters and rates to a JSON file at exit
 #
 # File formats:
 # * input.blastlist: blastlist
@@ -23,35 +26,40 @@
 # * cquery <file_1> <file_2> <file_3> ... [-e NUM]
 # * cquery intput_* [-e NUM]
 
+import sys
 import argparse
+from fhandle import blastlist, logmsg, zfile
 
 
 def main():
+    proglog = logmsg.message(prog='cquery', cmd=' '.join(sys.argv))
+
     parser = argparse.ArgumentParser(description='Count the number of queries with its hit rank greater than some value')
     parser.add_argument('input_file', nargs='*')
     parser.add_argument('-e', '--evalue', dest='ev_thresh', type=float, default=0.01,
                         help='evalue thresh (default: 0.01)')
+    logmsg.add_arguments(parser)
     args = parser.parse_args()
+    proglog.setup(args.progress, args.metrics)
 
     ranks = []
 
     for f in args.input_file:
-        with open(f, 'r') as fin:
+        with zfile.zopen(f, 'r', counter=lambda n: proglog.count('bytes', n)) as fin, proglog.stage('count'):
             old_rank = 0
             new_rank = 0
             redundant_hit = 0
 
-            for line in fin:
-                if line.lstrip() == '' or line.lstrip()[0] in ('#', 'a'):
-                    continue
+            for rec in blastlist.parse(fin):
+                proglog.count('hsps')
 
-                if float(line.split('\t')[17]) <= args.ev_thresh:
+                if rec.hsp_evalue <= args.ev_thresh:
 
-                    if line.split('\t')[3] in line.split('\t')[4]:
+                    if rec.query_name in rec.hit_name:
                         """Query hit itself, ignore it."""
                         redundant_hit = 1
 
-                    new_rank = int(line.split('\t')[0])
+                    new_rank = rec.aln_rank
 
                     if new_rank < old_rank:
                         ranks.append(old_rank - redundant_hit)
@@ -16,25 +16,36 @@
 # -f: Fuzzy mode. If this option is specified, any headers include the ID
 #     will be extracted.
 # -n: Use ID as header name
+# --progress NUM: write a progress line to stderr every NUM seconds. 0 means no progress lines.
+#                 (default: 0)
+# --metrics  STR: write the stage times, counters and rates to a JSON file at exit
 
+import sys
 import argparse
-from fhandle import fa, lists
+from fhandle import fa, lists, writer, logmsg
 
 
 def main():
+    proglog = logmsg.message(prog='expfa', cmd=' '.join(sys.argv))
+
     parser = argparse.ArgumentParser()
     parser.add_argument('file_fasta')
     parser.add_argument('file_id_list')
     parser.add_argument('file_output')
     parser.add_argument('-f', dest='fuzzy', action='store_true')
     parser.add_argument('-n', dest='idname', action='store_true')
+    logmsg.add_arguments(parser)
     args = parser.parse_args()
+    proglog.setup(args.progress, args.metrics)
+
+    with proglog.stage('load'):
+        seqs = fa.to_hash(args.file_fasta)
+        id_list = lists.to_list(args.file_id_list)
+        proglog.count('sequences', len(seqs))
 
-    seqs = fa.to_hash(args.file_fasta)
-    id_list = lists.to_list(args.file_id_list)
     count = 0
 
-    with open(args.file_output, 'w') as fw:
+    with writer.rowwriter(open(args.file_output, 'w')) as fw, proglog.stage('extract'):
         if args.fuzzy is True:
             for header in seqs:
                 for line in id_list:
@@ -47,7 +58,7 @@ def main():
                             fw.write(header + '\n')
                             fw.write(seqs[header] + '\n')
                         count += 1
-                        fw.flush()
+                        proglog.count('extracted')
         else:
             for line in id_list:
                 fw.write('>')
@@ -58,7 +69,7 @@ def main():
                     fw.write(header + '\n')
                     fw.write(seqs[header] + '\n')
                 count += 1
-                fw.flush()
+                proglog.count('extracted')
 
     print('# of sequence in fasta: %d' % (len(seqs)))
     print('# of sequence in list: %d' % (len(id_list)))
@@ -19,16 +19,22 @@
 # -s, --sep    STR: seperator (default: newline)
 # -o, --output STR: output file name. If this option is not specified, the script will generate
 #                   one with unique identifier at current directory.
+# --progress   NUM: write a progress line to stderr every NUM seconds. 0 means no progress lines.
+#                   (default: 0)
+# --metrics    STR: write the stage times, counters and rates to a JSON file at exit
 #
 # File formats:
 # * <input.fa>: fasta
 
+import sys
 import argparse
 from Bio import SeqIO
-from fhandle import name
+from fhandle import name, zfile, logmsg
 
 
 def main():
+    proglog = logmsg.message(prog='fa2lens', cmd=' '.join(sys.argv))
+
     parser = argparse.ArgumentParser(description='fa2lens - Extract length data from a fasta file')
     parser.add_argument('input_file')
     parser.add_argument('-s', '--sep', dest='sep', default='\n',
@@ -36,13 +42,21 @@ def main():
     parser.add_argument('-o', '--output', dest='output_file',
                         help='output file name. If this option is not specified, the script will generate '
                         'one with unique identifier at current directory.')
+    logmsg.add_arguments(parser)
     args = parser.parse_args()
+    proglog.setup(args.progress, args.metrics)
 
     if args.output_file is None:
         args.output_file = args.input_file + '_out_' + name.genid() + '.leng.txt'
 
-    with open(args.input_file, 'r') as fin, open(args.output_file, 'w') as fw:
-        records = map(str, map(len, list(SeqIO.parse(fin, 'fasta'))))
+    with zfile.zopen(args.input_file, 'r', counter=lambda n: proglog.count('bytes', n)) as fin, \
+            zfile.zopen(args.output_file, 'w') as fw, proglog.stage('length'):
+        records = []
+
+        for record in SeqIO.parse(fin, 'fasta'):
+            records.append(str(len(record)))
+            proglog.count('sequences')
+
         fw.write(args.sep.join(records))
         fw.flush()
 
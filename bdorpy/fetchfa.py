@@ -48,7 +48,9 @@ def main():
                         'one with unique identifier at current directory.')
     parser.add_argument('-l', '--log', dest='log_file',
                         help='log file name')
+    logmsg.add_arguments(parser)
     args = parser.parse_args()
+    proglog.setup(args.progress, args.metrics)
 
     if args.log_file is None:
         fwlog = open(args.output + '.log', 'w')
@@ -88,6 +90,7 @@ def main():
                     continue
 
                 query_num += 1
+                proglog.count('queries')
 
                 with open(os.path.abspath(args.output) + '/' + line.split('\t')[0] + '.fa', 'w') as fw:
                     alist = line.rstrip().split('\t')[1].split(',')
@@ -103,6 +106,7 @@ def main():
                         fw.write(handle.read())
                         fw.flush()
                         handle.close()
+                        proglog.count('requests')
 
                     handle = Entrez.efetch(db=args.database,
                                            id=','.join(alist),
@@ -111,6 +115,7 @@ def main():
                     fw.write(handle.read())
                     fw.flush()
                     handle.close()
+                    proglog.count('requests')
 
             fwlog.write('# Fetched queries: ' + str(query_num) + '\n')
             fwlog.write('#\n')
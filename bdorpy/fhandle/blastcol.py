@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+#
+# blastcol.py - Columnar binary blastlist
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# Required for the reader:
+# * NumPy: http://www.numpy.org
+#
+# A columnar blastlist is a directory with:
+# * meta.json:    the number of rows and the name and type of each column
+# * <column>.bin: the values of a column in a fixed-width little-endian array
+# * strings.bin, strings.idx: the string table. The string columns (aln_method, query_name,
+#                 hit_name and hit_description) are stored as int32 indices into the table, and
+#                 string i is strings.bin[idx[i]:idx[i + 1]] in UTF-8.
+#
+# The missing values (NA) are stored as INT_NA in the int columns and NaN in the float columns.
+# The writer only needs the standard library. The reader memory-maps the columns with NumPy, so
+# the rows can be filtered with vectorized masks, e.g. reader['hsp_evalue'] <= 1e-5.
+
+import os
+import sys
+import json
+from array import array
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+VERSION = 1
+BUFFER_ROWS = 65536
+INT_NA = -2147483648
+
+# (name, type) of the blastlist columns. 'i': int32, 'd': float64, 's': string index (int32)
+COLUMNS = (('aln_rank', 'i'),
+           ('aln_hspno', 'i'),
+           ('aln_method', 's'),
+           ('query_name', 's'),
+           ('hit_name', 's'),
+           ('query_length', 'i'),
+           ('query_hsp_start', 'i'),
+           ('query_hsp_end', 'i'),
+           ('query_strand', 'i'),
+           ('query_frame', 'i'),
+           ('hit_length', 'i'),
+           ('hit_hsp_start', 'i'),
+           ('hit_hsp_end', 'i'),
+           ('hit_strand', 'i'),
+           ('hit_frame', 'i'),
+           ('hsp_score', 'd'),
+           ('hsp_bits', 'd'),
+           ('hsp_evalue', 'd'),
+           ('hsp_length', 'i'),
+           ('hsp_gaps', 'i'),
+           ('hsp_identities', 'i'),
+           ('hsp_identity_percent', 'd'),
+           ('hsp_positives', 'i'),
+           ('hsp_positive_percent', 'd'),
+           ('query_coverage', 'd'),
+           ('hit_coverage', 'd'),
+           ('hit_description', 's'))
+
+DTYPES = {'i': '<i4', 'd': '<f8', 's': '<i4'}
+
+# The typecode of array with 4 bytes
+_INT32 = 'i' if array('i').itemsize == 4 else 'l'
+# The typecode of array with 8 bytes
+_UINT64 = 'L' if array('L').itemsize == 8 else 'Q'
+
+
+def _check_numpy():
+    if numpy is None:
+        raise ImportError('The NumPy module is required to read the columnar blastlist.')
+
+
+def _to_int(value):
+    if value == 'NA':
+        return INT_NA
+    return int(value)
+
+
+def _to_float(value):
+    if value == 'NA':
+        return float('nan')
+    return float(value)
+
+
+class columnwriter:
+    """Write the rows of blastlist fields to a columnar blastlist directory.
+
+    The rows are the same lists written to fhandle.writer.rowwriter, and the columns are appended
+    to the files every buffer_rows rows.
+    """
+
+    def __init__(self, dirname, buffer_rows=BUFFER_ROWS):
+        self.dirname = dirname
+        self.buffer_rows = buffer_rows
+        self.rows = 0
+        self.strings = {}
+        self.string_list = []
+        self.buffers = []
+
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+
+        for column, kind in COLUMNS:
+            if kind == 'd':
+                self.buffers.append(array('d'))
+            else:
+                self.buffers.append(array(_INT32))
+            # Truncate the column files
+            open(self.path(column), 'wb').close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def path(self, column):
+        return os.path.join(self.dirname, column + '.bin')
+
+    def intern(self, text):
+        index = self.strings.get(text)
+
+        if index is None:
+            index = len(self.string_list)
+            self.strings[text] = index
+            self.string_list.append(text)
+
+        return index
+
+    def write_row(self, fields):
+        for (column, kind), buf, value in zip(COLUMNS, self.buffers, fields):
+            if kind == 'i':
+                buf.append(_to_int(value))
+            elif kind == 'd':
+                buf.append(_to_float(value))
+            else:
+                buf.append(self.intern(value))
+
+        self.rows += 1
+
+        if self.rows % self.buffer_rows == 0:
+            self.flush()
+
+    def flush(self):
+        for (column, kind), buf in zip(COLUMNS, self.buffers):
+            if len(buf) == 0:
+                continue
+
+            if sys.byteorder == 'big':
+                buf.byteswap()
+
+            with open(self.path(column), 'ab') as fw:
+                buf.tofile(fw)
+
+            del buf[:]
+
+    def close(self):
+        self.flush()
+
+        offsets = array(_UINT64)
+        pos = 0
+        offsets.append(pos)
+
+        with open(os.path.join(self.dirname, 'strings.bin'), 'wb') as fw:
+            for text in self.string_list:
+                if isinstance(text, bytes):
+                    data = text
+                else:
+                    data = text.encode('utf-8')
+                fw.write(data)
+                pos += len(data)
+                offsets.append(pos)
+
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+
+        with open(os.path.join(self.dirname, 'strings.idx'), 'wb') as fw:
+            offsets.tofile(fw)
+
+        meta = {'version': VERSION,
+                'rows': self.rows,
+                'strings': len(self.string_list),
+                'columns': [[column, DTYPES[kind], kind] for column, kind in COLUMNS]}
+
+        with open(os.path.join(self.dirname, 'meta.json'), 'w') as fw:
+            json.dump(meta, fw, indent=1)
+
+
+class columnreader:
+    """Memory-mapped reader of a columnar blastlist directory.
+
+    reader[column] returns the NumPy array of the column. The string columns are arrays of
+    indices, and string(index) or strings(column, mask) returns the text.
+    """
+
+    def __init__(self, dirname):
+        _check_numpy()
+        self.dirname = dirname
+
+        with open(os.path.join(dirname, 'meta.json'), 'r') as fin:
+            self.meta = json.load(fin)
+
+        if self.meta['version'] != VERSION:
+            raise ValueError('Unsupported columnar blastlist version: ' + str(self.meta['version']))
+
+        self.rows = self.meta['rows']
+        self.kinds = dict((column, kind) for column, dtype, kind in self.meta['columns'])
+        self.dtypes = dict((column, dtype) for column, dtype, kind in self.meta['columns'])
+        self.columns = {}
+        self.string_data = None
+        self.string_index = None
+        self.string_ids = None
+
+    def __len__(self):
+        return self.rows
+
+    def __contains__(self, column):
+        return column in self.kinds
+
+    def __getitem__(self, column):
+        if column not in self.columns:
+            if column not in self.kinds:
+                raise KeyError(column)
+
+            if self.rows == 0:
+                self.columns[column] = numpy.zeros(0, dtype=self.dtypes[column])
+            else:
+                self.columns[column] = numpy.memmap(os.path.join(self.dirname, column + '.bin'),
+                                                    dtype=self.dtypes[column], mode='r', shape=(self.rows,))
+
+        return self.columns[column]
+
+    def _load_strings(self):
+        if self.string_index is None:
+            self.string_index = numpy.fromfile(os.path.join(self.dirname, 'strings.idx'), dtype='<u8')
+
+            if self.string_index[-1] == 0:
+                self.string_data = numpy.zeros(0, dtype='u1')
+            else:
+                self.string_data = numpy.memmap(os.path.join(self.dirname, 'strings.bin'), dtype='u1', mode='r')
+
+    def string(self, index):
+        """Return the string at index of the string table."""
+        self._load_strings()
+        start = int(self.string_index[index])
+        end = int(self.string_index[index + 1])
+
+        return self.string_data[start:end].tobytes().decode('utf-8')
+
+    def strings(self, column, mask=None):
+        """Return the text of a string column as a list. mask is a boolean array or index array
+        of the rows."""
+        if self.kinds[column] != 's':
+            raise ValueError(column + ' is not a string column')
+
+        indices = self[column]
+
+        if mask is not None:
+            indices = indices[mask]
+
+        cache = {}
+        texts = []
+
+        for index in indices.tolist():
+            if index not in cache:
+                cache[index] = self.string(index)
+            texts.append(cache[index])
+
+        return texts
+
+    def lookup(self, column, text):
+        """Return the string index of text, or -1 if it is not in the table. It can be used to build
+        a mask of a string column, e.g. reader['query_name'] == reader.lookup('query_name', name)."""
+        if self.kinds[column] != 's':
+            raise ValueError(column + ' is not a string column')
+
+        if self.string_ids is None:
+            self._load_strings()
+            self.string_ids = dict((self.string(i), i) for i in range(len(self.string_index) - 1))
+
+        return self.string_ids.get(text, -1)
+
+    def is_na(self, column):
+        """Return the boolean mask of the NA values of a column."""
+        values = self[column]
+
+        if self.kinds[column] == 'd':
+            return numpy.isnan(values)
+
+        return values == INT_NA
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+#
+# blastidx.py - Per-query byte-offset index of the blastlist
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# The index is a sidecar file <blastlist>.qidx. The first line records the size and the
+# modification time of the blastlist, and each of the other lines is a block of consecutive hsp
+# lines of a query:
+#
+# query_name<TAB>start<TAB>end
+#
+# where start and end are byte offsets in the blastlist. A query has more than one block if its
+# lines are not consecutive. The index is rebuilt when it does not match the blastlist.
+# Only uncompressed blastlists can be indexed.
+
+import os
+from fhandle import blastlist, zfile
+
+SUFFIX = '.qidx'
+MAGIC = '# blastlist query index'
+
+_query_column = blastlist.INDEX['query_name']
+_title = (blastlist.COLUMNS[0] + '\t').encode('ascii')
+
+
+def index_name(filename):
+    return filename + SUFFIX
+
+
+def _stamp(filename):
+    stat = os.stat(filename)
+    return str(stat.st_size) + '\t' + str(int(stat.st_mtime))
+
+
+def _is_record(line):
+    text = line.lstrip()
+    return text != b'' and text[:1] != b'#' and not text.startswith(_title)
+
+
+def _check_plain(filename):
+    if zfile.detect(filename) is not None:
+        raise ValueError(filename + ' is compressed. Only uncompressed blastlists can be indexed.')
+
+
+def scan(filename):
+    """Yield (query_name, start, end) of each block of the blastlist."""
+    _check_plain(filename)
+
+    query = None
+    start = end = 0
+    pos = 0
+
+    with open(filename, 'rb') as fin:
+        for line in fin:
+            line_start = pos
+            pos += len(line)
+
+            if not _is_record(line):
+                continue
+
+            name = line.split(b'\t', _query_column + 1)[_query_column]
+
+            if name != query:
+                if query is not None:
+                    yield query.decode('utf-8'), start, end
+                query = name
+                start = line_start
+
+            end = pos
+
+    if query is not None:
+        yield query.decode('utf-8'), start, end
+
+
+def build(filename, index_file=None):
+    """Build the index of the blastlist and write it to index_file. Return the index, a dict of
+    query_name to a list of (start, end)."""
+    if index_file is None:
+        index_file = index_name(filename)
+
+    index = {}
+
+    with open(index_file, 'w') as fw:
+        fw.write(MAGIC + '\t' + _stamp(filename) + '\n')
+
+        for query, start, end in scan(filename):
+            index.setdefault(query, []).append((start, end))
+            fw.write(query + '\t' + str(start) + '\t' + str(end) + '\n')
+
+    return index
+
+
+def load(filename, index_file=None):
+    """Return the index of the blastlist. The index file is built if it does not exist or does not
+    match the blastlist."""
+    if index_file is None:
+        index_file = index_name(filename)
+
+    if not os.path.exists(index_file):
+        return build(filename, index_file)
+
+    index = None
+
+    with open(index_file, 'r') as fin:
+        if fin.readline().rstrip('\n') == MAGIC + '\t' + _stamp(filename):
+            index = {}
+
+            for line in fin:
+                query, start, end = line.rstrip('\n').rsplit('\t', 2)
+                index.setdefault(query, []).append((int(start), int(end)))
+
+    if index is None:
+        return build(filename, index_file)
+
+    return index
+
+
+def fetch(filename, queries, index=None):
+    """Yield the lines of the queries in the given order. The queries missing in the blastlist are
+    skipped."""
+    if index is None:
+        index = load(filename)
+
+    with open(filename, 'rb') as fin:
+        for query in queries:
+            for start, end in index.get(query, ()):
+                fin.seek(start)
+                for line in fin.read(end - start).decode('utf-8').splitlines(True):
+                    if blastlist.is_record(line):
+                        yield line
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+#
+# blastlist.py - Streaming reader for the blastlist
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# Each line is split once, and the columns of fhandle.header.blastlist are read as attributes of
+# the record, e.g. rec.hsp_evalue. The numeric columns are converted when they are accessed, and
+# NA is read as None. The comment lines, blank lines and the title line are skipped.
+
+from fhandle import header
+
+COLUMNS = tuple(header.blastlist().get_all_tab().split('\t'))
+INDEX = dict((column, i) for i, column in enumerate(COLUMNS))
+
+INT_COLUMNS = ('aln_rank', 'aln_hspno', 'query_length', 'query_hsp_start', 'query_hsp_end',
+               'query_strand', 'query_frame', 'hit_length', 'hit_hsp_start', 'hit_hsp_end',
+               'hit_strand', 'hit_frame', 'hsp_length', 'hsp_gaps', 'hsp_identities', 'hsp_positives')
+
+FLOAT_COLUMNS = ('hsp_score', 'hsp_bits', 'hsp_evalue', 'hsp_identity_percent', 'hsp_positive_percent',
+                 'query_coverage', 'hit_coverage')
+
+
+class record(object):
+    """A blastlist line. line is the original text, and data is the list of the columns."""
+    __slots__ = ('line', 'data')
+
+    def __init__(self, line):
+        self.line = line
+        self.data = line.rstrip('\n').split('\t')
+
+    def text(self, column):
+        """Return the column as it is written in the line."""
+        return self.data[INDEX[column]]
+
+
+def _text_field(index):
+    def get(self):
+        return self.data[index]
+    return property(get)
+
+
+def _typed_field(index, convert):
+    def get(self):
+        value = self.data[index]
+        if value == 'NA':
+            return None
+        return convert(value)
+    return property(get)
+
+
+for _i, _column in enumerate(COLUMNS):
+    if _column in INT_COLUMNS:
+        setattr(record, _column, _typed_field(_i, int))
+    elif _column in FLOAT_COLUMNS:
+        setattr(record, _column, _typed_field(_i, float))
+    else:
+        setattr(record, _column, _text_field(_i))
+
+
+def is_record(line):
+    """Return False for the comment lines, blank lines and the title line."""
+    text = line.lstrip()
+    return text != '' and text[0] != '#' and not text.startswith(COLUMNS[0] + '\t')
+
+
+def parse(handle):
+    """Yield a record for each hsp line in the handle."""
+    for line in handle:
+        if is_record(line):
+            yield record(line)
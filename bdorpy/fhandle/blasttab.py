@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+#
+# blasttab.py - Parser for the blast tabular output (-outfmt 6 and 7)
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# The lines are grouped into the same records as fhandle.blastxml. The hits are ranked in the
+# order they first appear for each query. Values that are not in the columns are left as None.
+
+import re
+from fhandle.blastxml import record, alignment, hsp
+
+STD_FIELDS = ('qseqid', 'sseqid', 'pident', 'length', 'mismatch', 'gapopen',
+              'qstart', 'qend', 'sstart', 'send', 'evalue', 'bitscore')
+
+# Names used in the '# Fields:' line of -outfmt 7
+FIELD_NAMES = {'query id': 'qseqid',
+               'query acc.': 'qacc',
+               'query acc.ver': 'qaccver',
+               'query length': 'qlen',
+               'subject id': 'sseqid',
+               'subject acc.': 'sacc',
+               'subject acc.ver': 'saccver',
+               'subject length': 'slen',
+               'subject title': 'stitle',
+               'q. start': 'qstart',
+               'q. end': 'qend',
+               's. start': 'sstart',
+               's. end': 'send',
+               'evalue': 'evalue',
+               'bit score': 'bitscore',
+               'score': 'score',
+               'alignment length': 'length',
+               '% identity': 'pident',
+               'identical': 'nident',
+               'mismatches': 'mismatch',
+               'positives': 'positive',
+               'gap opens': 'gapopen',
+               'gaps': 'gaps',
+               '% positives': 'ppos',
+               'query frame': 'qframe',
+               'sbjct frame': 'sframe'}
+
+_program = re.compile(r'#\s+(\w*BLAST\w*)\s')
+
+
+def parse_fields(line):
+    """Return the short field names of a '# Fields:' line."""
+    names = line.split(':', 1)[1].strip().split(', ')
+    return tuple(FIELD_NAMES.get(n, n) for n in names)
+
+
+def _get(data, names, convert=str):
+    for n in names:
+        if n in data and data[n] not in ('', 'N/A'):
+            return convert(data[n])
+    return None
+
+
+def _to_hsp(data, application):
+    h = hsp()
+    h.query_start = int(data['qstart'])
+    h.query_end = int(data['qend'])
+    h.sbjct_start = int(data['sstart'])
+    h.sbjct_end = int(data['send'])
+    h.expect = float(data['evalue'])
+    h.bits = _get(data, ('bitscore',), float)
+    h.score = _get(data, ('score',), float)
+    h.align_length = _get(data, ('length',), int)
+    h.gaps = _get(data, ('gaps',), int)
+
+    h.identities = _get(data, ('nident',), int)
+    identity_percent = _get(data, ('pident',), float)
+    if h.identities is None and identity_percent is not None and h.align_length is not None:
+        h.identities = int(round(identity_percent * h.align_length / 100))
+
+    h.positives = _get(data, ('positive',), int)
+    positive_percent = _get(data, ('ppos',), float)
+    if h.positives is None and positive_percent is not None and h.align_length is not None:
+        h.positives = int(round(positive_percent * h.align_length / 100))
+
+    query_frame = _get(data, ('qframe',), int)
+    hit_frame = _get(data, ('sframe',), int)
+
+    if application is not None and 'BLASTN' in application:
+        # The strand is recorded as frame, the same as the XML of BLASTN
+        if query_frame is None:
+            query_frame = 1 if h.query_start <= h.query_end else -1
+        if hit_frame is None:
+            hit_frame = 1 if h.sbjct_start <= h.sbjct_end else -1
+
+    h.frame = (query_frame, hit_frame)
+
+    return h
+
+
+def parse(handle, fields=None, application=None):
+    """Yield a record for each query in the handle.
+
+    fields: the short names of the columns. The '# Fields:' line is used if it is None.
+    application: the program name, e.g. BLASTX. The '# BLASTX ...' line is used if it is None.
+    """
+    has_fields = fields is not None
+    has_application = application is not None
+
+    if fields is None:
+        fields = STD_FIELDS
+
+    rec = None
+    hits = {}
+
+    for line in handle:
+        if line[0] == '#':
+            if line.startswith('# Fields:') and has_fields is False:
+                fields = parse_fields(line)
+            elif has_application is False:
+                match = _program.match(line)
+                if match is not None:
+                    application = match.group(1).upper()
+            continue
+
+        if line.strip() == '':
+            continue
+
+        data = dict(zip(fields, line.rstrip('\n').split('\t')))
+        query = _get(data, ('qseqid', 'qaccver', 'qacc'))
+
+        if rec is None or rec.query != query:
+            if rec is not None:
+                yield rec
+
+            if application is None:
+                rec = record('NA')
+            else:
+                rec = record(application)
+
+            rec.query = query
+            rec.query_length = _get(data, ('qlen',), int)
+            hits = {}
+
+        hit_id = _get(data, ('sseqid', 'saccver', 'sacc'))
+
+        if hit_id in hits:
+            aln = hits[hit_id]
+        else:
+            aln = alignment()
+            aln.hit_id = hit_id
+            aln.hit_def = _get(data, ('stitle',))
+            aln.title = hit_id
+            if aln.hit_def is not None:
+                aln.title += ' ' + aln.hit_def
+            aln.length = _get(data, ('slen',), int)
+            hits[hit_id] = aln
+            rec.alignments.append(aln)
+
+        aln.hsps.append(_to_hsp(data, application))
+
+    if rec is not None:
+        yield rec
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+#
+# blastxml.py - Streaming parser for the NCBI blast XML
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# The records have the same attribute names as the ones generated with Bio.Blast.NCBIXML,
+# but only the values written to the blastlist are kept. The file is read by blocks, and each
+# <Iteration> element is cut out and parsed on its own, so the tree of one query is all that is
+# held in memory. The alignment strings (Hsp_qseq, Hsp_hseq and Hsp_midline) are never stored.
+
+import os
+import re
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class record(object):
+    __slots__ = ('application', 'query', 'query_length', 'alignments')
+
+    def __init__(self, application=None):
+        self.application = application
+        self.query = None
+        self.query_length = None
+        self.alignments = []
+
+
+class alignment(object):
+    __slots__ = ('hit_id', 'hit_def', 'title', 'accession', 'length', 'hsps')
+
+    def __init__(self):
+        self.hit_id = None
+        self.hit_def = None
+        self.title = ''
+        self.accession = None
+        self.length = None
+        self.hsps = []
+
+
+class hsp(object):
+    __slots__ = ('score', 'bits', 'expect', 'query_start', 'query_end', 'sbjct_start', 'sbjct_end',
+                 'strand', 'frame', 'identities', 'positives', 'gaps', 'align_length')
+
+    def __init__(self):
+        self.score = None
+        self.bits = None
+        self.expect = None
+        self.query_start = None
+        self.query_end = None
+        self.sbjct_start = None
+        self.sbjct_end = None
+        self.strand = (None, None)
+        self.frame = ()
+        self.identities = None
+        self.positives = None
+        self.gaps = (None, None)
+        self.align_length = None
+
+
+ITERATION_START = b'<Iteration>'
+ITERATION_END = b'</Iteration>'
+
+_header_field = re.compile(br'<BlastOutput_(program|query-def|query-len)>.*?</BlastOutput_\1>', re.S)
+
+_hsp_fields = {'Hsp_score': ('score', float),
+               'Hsp_bit-score': ('bits', float),
+               'Hsp_evalue': ('expect', float),
+               'Hsp_query-from': ('query_start', int),
+               'Hsp_query-to': ('query_end', int),
+               'Hsp_hit-from': ('sbjct_start', int),
+               'Hsp_hit-to': ('sbjct_end', int),
+               'Hsp_identity': ('identities', int),
+               'Hsp_positive': ('positives', int),
+               'Hsp_gaps': ('gaps', int),
+               'Hsp_align-len': ('align_length', int)}
+
+
+def _text(elem):
+    if elem.text is None:
+        return ''
+    return elem.text.strip()
+
+
+class header(object):
+    """Values of the <BlastOutput> element used by the records."""
+
+    def __init__(self, data=b''):
+        self.application = None
+        self.query = None
+        self.query_length = None
+
+        for match in _header_field.finditer(data):
+            elem = ElementTree.fromstring(match.group(0))
+            if elem.tag == 'BlastOutput_program':
+                self.application = _text(elem).upper()
+            elif elem.tag == 'BlastOutput_query-def':
+                self.query = _text(elem)
+            else:
+                self.query_length = int(_text(elem))
+
+
+def to_record(data, head):
+    """Build a record from the bytes of an <Iteration> element."""
+    iteration = ElementTree.fromstring(data)
+    rec = record(head.application)
+
+    rec.query = _text(iteration.find('Iteration_query-def'))
+    if not rec.query:
+        rec.query = head.query
+
+    query_length = iteration.find('Iteration_query-len')
+    if query_length is None:
+        rec.query_length = head.query_length
+    else:
+        rec.query_length = int(_text(query_length))
+
+    for hit in iteration.iter('Hit'):
+        aln = alignment()
+
+        for child in hit:
+            if child.tag == 'Hit_id':
+                aln.hit_id = _text(child)
+                aln.title = aln.hit_id + ' '
+            elif child.tag == 'Hit_def':
+                aln.hit_def = _text(child)
+                aln.title += aln.hit_def
+            elif child.tag == 'Hit_accession':
+                aln.accession = _text(child)
+            elif child.tag == 'Hit_len':
+                aln.length = int(_text(child))
+
+        for elem in hit.iter('Hsp'):
+            h = hsp()
+
+            for child in elem:
+                if child.tag in _hsp_fields:
+                    attr, convert = _hsp_fields[child.tag]
+                    setattr(h, attr, convert(_text(child)))
+                elif child.tag in ('Hsp_query-frame', 'Hsp_hit-frame'):
+                    h.frame += (int(_text(child)),)
+
+            aln.hsps.append(h)
+
+        rec.alignments.append(aln)
+
+    return rec
+
+
+def iterations(handle, offset=0, size=None, chunk_size=CHUNK_SIZE):
+    """Yield (start, end, data) of each <Iteration> element, where start and end are the byte
+    offsets in the file. The bytes before the first <Iteration> are yielded with start None.
+    offset is the position of the handle when it is passed in. If size is given, no more than
+    size bytes are read.
+    """
+    buf = bytearray()
+    buf_offset = offset
+    has_header = False
+    # The start of the <Iteration> in buf whose end tag is not read yet, or -1
+    start = -1
+    # The positions in buf to search the next start and end tags from, so the bytes searched before
+    # are not searched again when a large <Iteration> spans many chunks
+    start_pos = 0
+    end_pos = 0
+
+    while True:
+        if size is None:
+            data = handle.read(chunk_size)
+        else:
+            data = handle.read(min(chunk_size, size))
+            size -= len(data)
+
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+
+        # A tag split between the chunks begins in the last bytes of buf
+        if start < 0:
+            start_pos = max(start_pos, len(buf) - len(ITERATION_START))
+        else:
+            end_pos = max(end_pos, len(buf) - len(ITERATION_END))
+
+        buf += data
+
+        while True:
+            if start < 0:
+                start = buf.find(ITERATION_START, start_pos)
+
+                if start < 0:
+                    break
+
+                if has_header is False:
+                    yield None, buf_offset + start, bytes(buf[:start])
+                    has_header = True
+
+                end_pos = start
+
+            end = buf.find(ITERATION_END, end_pos)
+
+            if end < 0:
+                break
+
+            end += len(ITERATION_END)
+            yield buf_offset + start, buf_offset + end, bytes(buf[start:end])
+            start = -1
+            start_pos = end
+
+        if not data:
+            if has_header is False:
+                yield None, buf_offset + len(buf), bytes(buf)
+            break
+
+        # Drop the bytes before the current <Iteration>, or before the next start tag. The bytes
+        # before the first <Iteration> are kept for the header.
+        if start >= 0:
+            drop = start
+        elif has_header is True:
+            drop = start_pos
+        else:
+            drop = 0
+
+        if drop > 0:
+            del buf[:drop]
+            buf_offset += drop
+            start_pos -= drop
+
+            if start >= 0:
+                start -= drop
+                end_pos -= drop
+
+
+def parse(handle, chunk_size=CHUNK_SIZE):
+    """Yield a record for each <Iteration> in the handle."""
+    head = header()
+
+    for start, end, data in iterations(handle, chunk_size=chunk_size):
+        if start is None:
+            head = header(data)
+        else:
+            yield to_record(data, head)
+
+
+def find(handle, pattern, offset, chunk_size=CHUNK_SIZE):
+    """Return the offset of the first pattern at or after offset, or None."""
+    handle.seek(offset)
+    buf = b''
+
+    while True:
+        data = handle.read(chunk_size)
+
+        if not data:
+            return None
+
+        buf += data
+        pos = buf.find(pattern)
+
+        if pos >= 0:
+            return offset + pos
+
+        offset += len(buf) - len(pattern) + 1
+        buf = buf[len(buf) - len(pattern) + 1:]
+
+
+def shards(filename, number):
+    """Split the file into at most number of byte ranges starting at <Iteration> tags.
+    Return the header and a list of (start, end).
+    """
+    size = os.path.getsize(filename)
+
+    with open(filename, 'rb') as handle:
+        first = find(handle, ITERATION_START, 0)
+
+        if first is None:
+            handle.seek(0)
+            return header(handle.read()), []
+
+        handle.seek(0)
+        head = header(handle.read(first))
+        bounds = [first]
+
+        for i in range(1, number):
+            pos = find(handle, ITERATION_START, max(size * i // number, bounds[-1] + 1))
+
+            if pos is None:
+                break
+
+            if pos > bounds[-1]:
+                bounds.append(pos)
+
+    return head, list(zip(bounds, bounds[1:] + [size]))
+
+
+def parse_shard(filename, start, end, head):
+    """Yield a record for each <Iteration> in the byte range of the file."""
+    with open(filename, 'rb') as handle:
+        handle.seek(start)
+
+        for s, e, data in iterations(handle, offset=start, size=end - start):
+            if s is not None:
+                yield to_record(data, head)
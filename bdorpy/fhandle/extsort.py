@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+#
+# extsort.py - External merge sort of delimited lines
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# The lines are sorted in memory by blocks of buffer_size characters. The sorted blocks are
+# spilled to temporary run files with marshal, and the runs are merged with heapq.merge. No more
+# than MERGE_WIDTH runs are opened at a time; more runs are merged into longer runs first.
+#
+# Keys are written like the -k options of the Unix sort with the field separator -t, but each
+# key covers one field. The number is the field number (starting at 1), followed by the flags:
+# * g: general numeric. The leading number of the field is compared. Non-numbers sort first,
+#      then NaN, then the numbers.
+# * d: dictionary order. Only blanks and alphanumeric characters are compared.
+# * r: reverse the order of the key.
+# A key without g or d is compared as text. The keys are compared as in the C locale, and the
+# lines with equal keys are compared as a whole, the same as sort without -s.
+#
+# For example, sort -t$'\t' -k9g,9 -k4d,4 -k18gr,18 is sort_lines(lines, ['9g', '4d', '18gr']).
+
+import os
+import re
+import heapq
+import marshal
+import tempfile
+
+BUFFER_SIZE = 64 * 1024 * 1024
+BLOCK_LINES = 4096
+MERGE_WIDTH = 64
+
+_key_spec = re.compile(r'^(\d+)([gdr]*)$')
+_number = re.compile(r'\s*([+-]?(?:(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|inf(?:inity)?|nan))', re.I)
+_non_dictionary = re.compile(r'[^A-Za-z0-9 \t]')
+
+
+class _reverse(object):
+    """Wrap a value to compare in the reverse order."""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __ne__(self, other):
+        return self.value != other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __gt__(self, other):
+        return other.value > self.value
+
+
+def _general_numeric(text):
+    match = _number.match(text)
+
+    if match is None:
+        return (0, 0.0)
+
+    value = float(match.group(1))
+
+    if value != value:
+        # NaN
+        return (1, 0.0)
+
+    return (2, value)
+
+
+def _general_numeric_reverse(text):
+    rank, value = _general_numeric(text)
+    return (-rank, -value)
+
+
+def _dictionary(text):
+    return _non_dictionary.sub('', text)
+
+
+def _dictionary_reverse(text):
+    return _reverse(_non_dictionary.sub('', text))
+
+
+def _text_reverse(text):
+    return _reverse(text)
+
+
+def parse_keys(keys):
+    """Return a list of (field index, convert) of the key specs."""
+    parsed = []
+
+    for key in keys:
+        match = _key_spec.match(key)
+
+        if match is None:
+            raise ValueError('Invalid sort key: ' + key)
+
+        index = int(match.group(1)) - 1
+        flags = match.group(2)
+
+        if 'g' in flags and 'd' in flags:
+            raise ValueError('Invalid sort key: ' + key + ' (g and d can not be combined)')
+
+        if 'g' in flags:
+            convert = _general_numeric_reverse if 'r' in flags else _general_numeric
+        elif 'd' in flags:
+            convert = _dictionary_reverse if 'r' in flags else _dictionary
+        else:
+            convert = _text_reverse if 'r' in flags else None
+
+        parsed.append((index, convert))
+
+    return parsed
+
+
+def key_function(keys, sep='\t'):
+    """Return a function that maps a line to its sort key."""
+    parsed = parse_keys(keys)
+
+    def key(line):
+        text = line.rstrip('\n')
+        fields = text.split(sep)
+        values = []
+
+        for index, convert in parsed:
+            if index < len(fields):
+                field = fields[index]
+            else:
+                field = ''
+
+            if convert is None:
+                values.append(field)
+            else:
+                values.append(convert(field))
+
+        values.append(text)
+
+        return tuple(values)
+
+    return key
+
+
+def _write_run(lines, tmpdir):
+    fd, filename = tempfile.mkstemp(prefix='extsort.', suffix='.run', dir=tmpdir)
+
+    with os.fdopen(fd, 'wb') as fw:
+        block = []
+
+        for line in lines:
+            block.append(line)
+
+            if len(block) == BLOCK_LINES:
+                marshal.dump(block, fw)
+                block = []
+
+        if block:
+            marshal.dump(block, fw)
+
+    return filename
+
+
+def _read_run(filename, key):
+    with open(filename, 'rb') as fin:
+        while True:
+            try:
+                block = marshal.load(fin)
+            except EOFError:
+                break
+
+            for line in block:
+                yield key(line), line
+
+
+def _merge(runs, key):
+    try:
+        for item in heapq.merge(*[_read_run(filename, key) for filename in runs]):
+            yield item[1]
+    finally:
+        _remove(runs)
+
+
+def _remove(runs):
+    for filename in runs:
+        if os.path.exists(filename):
+            os.remove(filename)
+
+
+def sort_lines(lines, keys, sep='\t', buffer_size=BUFFER_SIZE, tmpdir=None):
+    """Sort the lines with the keys, using no more than about buffer_size characters of lines in
+    memory. The input is read and the runs are written when this function is called, and the
+    returned iterator merges the runs.
+    """
+    key = key_function(keys, sep)
+    runs = []
+    merged = []
+    block = []
+    size = 0
+
+    try:
+        for line in lines:
+            block.append(line)
+            size += len(line)
+
+            if size >= buffer_size:
+                block.sort(key=key)
+                runs.append(_write_run(block, tmpdir))
+                block = []
+                size = 0
+
+        block.sort(key=key)
+
+        if not runs:
+            return iter(block)
+
+        if block:
+            runs.append(_write_run(block, tmpdir))
+
+        while len(runs) > MERGE_WIDTH:
+            merged = []
+
+            for i in range(0, len(runs), MERGE_WIDTH):
+                merged.append(_write_run(_merge(runs[i:i + MERGE_WIDTH], key), tmpdir))
+
+            runs = merged
+            merged = []
+    except BaseException:
+        # Also remove the runs when the sort is interrupted, e.g. by KeyboardInterrupt
+        _remove(runs + merged)
+        raise
+
+    return _merge(runs, key)
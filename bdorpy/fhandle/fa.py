@@ -10,11 +10,16 @@
 # Version: 0.1
 # Created: 2013.1.20
 
+import os
+import mmap
+from collections import OrderedDict
+from fhandle import zfile
+
 
 def to_hash(filename):
     seqs = {}
 
-    with open(filename, 'r') as fin:
+    with zfile.zopen(filename, 'r') as fin:
         for line in fin:
             if line[0] == '>':
                 header = line.rstrip().lstrip('>')
@@ -23,3 +28,131 @@ def to_hash(filename):
                 seqs[header] += line.rstrip()
 
     return seqs
+
+
+class faidx:
+    """Random access to an uncompressed fasta file through a samtools faidx compatible index.
+
+    The index <filename>.fai is read if it is newer than the fasta file, otherwise it is built and
+    written (kept in memory only if it can not be written). Each line of the index is
+
+    name<TAB>length<TAB>offset<TAB>line bases<TAB>line width
+
+    where name is the first word of the header. The file is memory-mapped, and only the requested
+    part of a sequence is read.
+    """
+    def __init__(self, filename, index_file=None):
+        if zfile.detect(filename) is not None:
+            raise ValueError(filename + ' is compressed. Only uncompressed fasta files can be indexed.')
+
+        self.filename = filename
+        self.index_file = filename + '.fai' if index_file is None else index_file
+        self.index = OrderedDict()
+
+        if (os.path.exists(self.index_file) and
+                os.path.getmtime(self.index_file) >= os.path.getmtime(filename)):
+            self._read_index()
+        else:
+            self._build_index()
+
+        self.fin = open(filename, 'rb')
+
+        if os.path.getsize(filename) > 0:
+            self.data = mmap.mmap(self.fin.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _read_index(self):
+        with open(self.index_file, 'r') as fin:
+            for line in fin:
+                name, length, offset, line_bases, line_width = line.rstrip('\n').split('\t')[:5]
+                self.index[name] = (int(length), int(offset), int(line_bases), int(line_width))
+
+    def _build_index(self):
+        name = None
+        length = offset = line_bases = line_width = 0
+        last_line = False
+        pos = 0
+
+        with open(self.filename, 'rb') as fin:
+            for line in fin:
+                line_start = pos
+                pos += len(line)
+
+                if line[:1] == b'>':
+                    if name is not None:
+                        self.index[name] = (length, offset, line_bases, line_width)
+
+                    name = line[1:].split(None, 1)[0].decode('utf-8') if line[1:].strip() else ''
+                    length = line_bases = line_width = 0
+                    offset = pos
+                    last_line = False
+                    continue
+
+                bases = len(line.rstrip(b'\r\n'))
+
+                if name is None or bases == 0:
+                    continue
+
+                if last_line:
+                    raise ValueError(self.filename + ': different line length in sequence ' + name +
+                                     ' at byte ' + str(line_start))
+
+                if line_bases == 0:
+                    line_bases = bases
+                    line_width = len(line)
+                elif bases != line_bases or len(line) != line_width:
+                    # Only the last line of a sequence can be shorter
+                    if bases > line_bases:
+                        raise ValueError(self.filename + ': different line length in sequence ' + name +
+                                         ' at byte ' + str(line_start))
+                    last_line = True
+
+                length += bases
+
+        if name is not None:
+            self.index[name] = (length, offset, line_bases, line_width)
+
+        try:
+            with open(self.index_file, 'w') as fw:
+                for name, (length, offset, line_bases, line_width) in self.index.items():
+                    fw.write('\t'.join([name, str(length), str(offset), str(line_bases), str(line_width)]) + '\n')
+        except (IOError, OSError):
+            pass
+
+    def length(self, name):
+        return self.index[name][0]
+
+    def fetch(self, name, start=0, end=None):
+        """Return the sequence[start:end] of name. start and end are 0-based like a slice."""
+        length, offset, line_bases, line_width = self.index[name]
+        start, end, step = slice(start, end).indices(length)
+
+        if start >= end or line_bases == 0:
+            return ''
+
+        first = offset + start // line_bases * line_width + start % line_bases
+        last = offset + (end - 1) // line_bases * line_width + (end - 1) % line_bases + 1
+        seq = self.data[first:last]
+
+        return seq.replace(b'\n', b'').replace(b'\r', b'').decode('ascii')
+
+    def close(self):
+        if not isinstance(self.data, bytes):
+            self.data.close()
+        self.fin.close()
@@ -10,10 +10,12 @@
 # Version: 0.1
 # Created: 2013.1.20
 
+from fhandle import zfile
+
 
 def to_list(filename):
     lists = []
-    with open(filename, 'r') as fin:
+    with zfile.zopen(filename, 'r') as fin:
         for line in fin:
             lists.append(line.rstrip())
 
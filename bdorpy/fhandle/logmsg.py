@@ -7,19 +7,55 @@
 # http://opensource.org/licenses/MIT
 #
 # Author: Jian-Long Huang (jianlong@ntu.edu.tw)
-# Version: 0.1
+# Version: 0.2
 # Created: 2013.1.25
+#
+# Besides the messages of the output headers, message keeps:
+# * stages:   named timers, e.g. with proglog.stage('sort'): ...
+# * counters: e.g. proglog.count('hsps', 10). The counts are also kept for the current stage.
+# * progress: a line with the counters and rates is written to stderr every progress seconds.
+# * metrics:  the stages, counters and rates are written to a JSON file at exit.
 
+import sys
+import json
 import time
+import atexit
 import datetime
+import contextlib
+from collections import OrderedDict
+
+
+def add_arguments(parser):
+    """Add the --progress and --metrics options to an argparse parser."""
+    parser.add_argument('--progress', dest='progress', type=float, default=0,
+                        help='write a progress line to stderr every NUM seconds. 0 means no progress lines. '
+                        '(default: 0)')
+    parser.add_argument('--metrics', dest='metrics',
+                        help='write the stage times, counters and rates to a JSON file at exit')
 
 
 class message:
-    def __init__(self, prog=None, cmd=None):
+    def __init__(self, prog=None, cmd=None, progress=0, metrics=None):
         self.prog = prog
         self.cmd = cmd
         self.stime = time.time()
         self.asctime = time.asctime()
+        self.progress = 0
+        self.metrics = None
+        self.last_progress = self.stime
+        self.current = None
+        self.stages = OrderedDict()
+        self.counters = OrderedDict()
+        self.setup(progress, metrics)
+
+    def setup(self, progress=0, metrics=None):
+        """Set the interval of the progress lines and the metrics file."""
+        self.progress = progress
+
+        if metrics is not None and self.metrics is None:
+            atexit.register(self.write_metrics)
+
+        self.metrics = metrics
 
     def start_message(self):
         yield '# This output was generated with ' + self.prog + '.\n'
@@ -29,3 +65,90 @@ class message:
     def end_message(self):
         yield '# Successfully executed.' + '\n'
         yield '# Elapsed time: ' + str(datetime.timedelta(seconds=round(time.time() - self.stime))) + '\n'
+
+    def elapsed(self):
+        return time.time() - self.stime
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the block as the stage name. The time of a stage entered more than once is summed."""
+        if name not in self.stages:
+            self.stages[name] = {'seconds': 0.0, 'counters': OrderedDict()}
+
+        parent = self.current
+        self.current = name
+        start = time.time()
+
+        try:
+            yield
+        finally:
+            self.stages[name]['seconds'] += time.time() - start
+            self.current = parent
+
+    def count(self, name, number=1):
+        self.counters[name] = self.counters.get(name, 0) + number
+
+        if self.current is not None:
+            counters = self.stages[self.current]['counters']
+            counters[name] = counters.get(name, 0) + number
+
+        if self.progress > 0:
+            now = time.time()
+
+            if now - self.last_progress >= self.progress:
+                self.last_progress = now
+                self.report()
+
+    def report(self, stream=None):
+        """Write a progress line."""
+        if stream is None:
+            stream = sys.stderr
+
+        elapsed = self.elapsed()
+        line = '# ' + str(self.prog)
+
+        if self.current is not None:
+            line += ' [' + self.current + ']'
+
+        line += ' ' + str(datetime.timedelta(seconds=round(elapsed)))
+
+        for name, number in self.counters.items():
+            line += ' ' + name + ': ' + str(number) + ' (' + _rate(number, elapsed) + '/s)'
+
+        stream.write(line + '\n')
+        stream.flush()
+
+    def get_metrics(self):
+        elapsed = self.elapsed()
+        stages = OrderedDict()
+
+        for name, stage in self.stages.items():
+            stages[name] = {'seconds': round(stage['seconds'], 3),
+                            'counters': stage['counters'],
+                            'rates': OrderedDict((n, float(_rate(c, stage['seconds'])))
+                                                 for n, c in stage['counters'].items())}
+
+        return OrderedDict([('prog', self.prog),
+                            ('cmd', self.cmd),
+                            ('start', self.asctime),
+                            ('elapsed', round(elapsed, 3)),
+                            ('stages', stages),
+                            ('counters', self.counters),
+                            ('rates', OrderedDict((n, float(_rate(c, elapsed))) for n, c in self.counters.items()))])
+
+    def write_metrics(self, filename=None):
+        if filename is None:
+            filename = self.metrics
+
+        if filename is None:
+            return
+
+        with open(filename, 'w') as fw:
+            json.dump(self.get_metrics(), fw, indent=1)
+            fw.write('\n')
+
+
+def _rate(number, seconds):
+    if seconds <= 0:
+        return '0.0'
+    return str(round(number / float(seconds), 1))
@@ -10,6 +10,8 @@
 # Version: 0.1
 # Created: 2013.1.20
 
+import os
+import glob
 import string
 import random
 
@@ -17,3 +19,47 @@ import random
 def genid(size=6, chars=string.ascii_uppercase + string.digits):
     random.seed()
     return ''.join(random.choice(chars) for i in range(size))
+
+
+def expand(patterns):
+    """Expand Unix style pathname patterns. A pattern that matches no files is kept as it is."""
+    filenames = []
+
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+
+        if matches:
+            filenames.extend(matches)
+        else:
+            filenames.append(pattern)
+
+    return filenames
+
+
+def batch_outputs(filenames, dirpath, suffix):
+    """Return the output file under dirpath of each input file, the path of the input relative to
+    the common directory of the inputs with suffix, e.g. a/chunk_001.xml and b/chunk_001.xml to
+    <dirpath>/a/chunk_001.xml<suffix> and <dirpath>/b/chunk_001.xml<suffix>. The inputs in one
+    directory are written to <dirpath>/<basename><suffix>. Raise ValueError if an input file is
+    given more than once."""
+    paths = [os.path.abspath(filename) for filename in filenames]
+    dirs = [os.path.dirname(path).split(os.sep) for path in paths]
+    common = dirs[0]
+
+    for parts in dirs[1:]:
+        i = 0
+        while i < min(len(common), len(parts)) and common[i] == parts[i]:
+            i += 1
+        common = common[:i]
+
+    common = os.sep.join(common) or os.sep
+    outputs = []
+    seen = {}
+
+    for filename, path in zip(filenames, paths):
+        if path in seen:
+            raise ValueError('The input file ' + filename + ' is given more than once (' + seen[path] + ').')
+        seen[path] = filename
+        outputs.append(os.path.join(dirpath, os.path.relpath(path, common) + suffix))
+
+    return outputs
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+#
+# pack.py - Container of many small text files in one file
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# A pack is a file of the concatenated records, e.g. the MSA input or output of each hit, and an
+# index <pack>.idx with a line for each record in the order they are written:
+#
+# name<TAB>offset<TAB>length
+#
+# where offset and length are in bytes. A record written again with the same name replaces the
+# earlier one in the index. The records are encoded in UTF-8.
+#
+# packreader reads a record with os.pread where it is available, which does not move the file
+# offset, so a reader inherited by forked worker processes can be read by all of them.
+
+import os
+
+SUFFIX = '.idx'
+
+
+def index_name(filename):
+    return filename + SUFFIX
+
+
+def is_pack(path):
+    return os.path.isfile(path) and os.path.exists(index_name(path))
+
+
+def _to_bytes(text):
+    if isinstance(text, bytes):
+        return text
+    return text.encode('utf-8')
+
+
+class packwriter:
+    def __init__(self, filename):
+        self.filename = filename
+        self.fw = open(filename, 'wb')
+        self.fwidx = open(index_name(filename), 'w')
+        self.offset = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, name, text):
+        data = _to_bytes(text)
+        self.fw.write(data)
+        self.fwidx.write(name + '\t' + str(self.offset) + '\t' + str(len(data)) + '\n')
+        self.offset += len(data)
+
+    def close(self):
+        self.fw.close()
+        self.fwidx.close()
+
+
+class packreader:
+    def __init__(self, filename):
+        self.filename = filename
+        self.names = []
+        self.index = {}
+
+        with open(index_name(filename), 'r') as fin:
+            for line in fin:
+                name, offset, length = line.rstrip('\n').rsplit('\t', 2)
+
+                if name not in self.index:
+                    self.names.append(name)
+
+                self.index[name] = (int(offset), int(length))
+
+        self.fin = open(filename, 'rb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def read_bytes(self, name):
+        offset, length = self.index[name]
+
+        if hasattr(os, 'pread'):
+            return os.pread(self.fin.fileno(), length, offset)
+
+        self.fin.seek(offset)
+        return self.fin.read(length)
+
+    def read(self, name):
+        return self.read_bytes(name).decode('utf-8')
+
+    def items(self):
+        for name in self.names:
+            yield name, self.read(name)
+
+    def close(self):
+        self.fin.close()
+
+
+def pack(dirpath, filename, counter=None):
+    """Pack the files under dirpath. The names are the paths relative to dirpath. Return the number
+    of files. counter, if not None, is called with 1 after each file."""
+    number = 0
+
+    with packwriter(filename) as fw:
+        for root, dirs, files in os.walk(dirpath):
+            dirs.sort()
+
+            for name in sorted(files):
+                with open(os.path.join(root, name), 'rb') as fin:
+                    fw.write(os.path.relpath(os.path.join(root, name), dirpath), fin.read())
+                number += 1
+
+                if counter is not None:
+                    counter(1)
+
+    return number
+
+
+def explode(filename, dirpath, counter=None):
+    """Write each record of the pack to its own file under dirpath. Return the number of files.
+    counter, if not None, is called with 1 after each file."""
+    number = 0
+
+    with packreader(filename) as fin:
+        for name in fin:
+            path = os.path.join(dirpath, name)
+
+            if os.path.isabs(name) or os.path.normpath(name).split(os.sep)[0] == os.pardir:
+                raise ValueError('The record name ' + name + ' is outside the output directory.')
+
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+
+            with open(path, 'wb') as fw:
+                fw.write(fin.read_bytes(name))
+
+            number += 1
+
+            if counter is not None:
+                counter(1)
+
+    return number
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+#
+# seqstore.py - Read-only packed sequence store shared by worker processes
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# The sequences of fasta files are packed into one file without headers and line breaks, and an
+# offset table <store>.idx has a line for each sequence:
+#
+# name<TAB>offset<TAB>length
+#
+# where name is the first word of the header, as in Bio.SeqIO.to_dict. A sequence that appears
+# again in a later file replaces the earlier one. The store is memory-mapped, so the processes that
+# open it share the pages of the file instead of copies of the sequences.
+#
+# With multiprocessing, each worker opens the store once with the pool initializer:
+#
+# pool = Pool(processes=n, initializer=seqstore.initializer, initargs=(store_file,))
+#
+# and the tasks call seqstore.shared() to get it, so only sequence names are sent to the workers.
+
+import os
+import mmap
+from fhandle import zfile
+
+SUFFIX = '.idx'
+
+_shared = None
+
+
+def build(fasta_files, filename):
+    """Pack the sequences of the fasta files into filename and write its offset table. Return the
+    number of sequences."""
+    index = {}
+    order = []
+    offset = 0
+
+    with open(filename, 'wb') as fw:
+        for fasta_file in fasta_files:
+            name = None
+
+            with zfile.zopen(fasta_file, 'r') as fin:
+                for line in fin:
+                    if line[:1] == '>':
+                        if name is not None:
+                            _add(index, order, name, start, offset)
+
+                        name = line[1:].split(None, 1)[0] if line[1:].strip() else ''
+                        start = offset
+                    elif name is not None:
+                        seq = line.strip().encode('ascii')
+                        fw.write(seq)
+                        offset += len(seq)
+
+            if name is not None:
+                _add(index, order, name, start, offset)
+
+    with open(filename + SUFFIX, 'w') as fw:
+        for name in order:
+            start, length = index[name]
+            fw.write(name + '\t' + str(start) + '\t' + str(length) + '\n')
+
+    return len(order)
+
+
+def _add(index, order, name, start, end):
+    if name not in index:
+        order.append(name)
+    index[name] = (start, end - start)
+
+
+class seqstore:
+    def __init__(self, filename):
+        self.filename = filename
+        self.index = {}
+
+        with open(filename + SUFFIX, 'r') as fin:
+            for line in fin:
+                name, start, length = line.rstrip('\n').rsplit('\t', 2)
+                self.index[name] = (int(start), int(length))
+
+        self.fin = open(filename, 'rb')
+
+        if os.path.getsize(filename) > 0:
+            self.data = mmap.mmap(self.fin.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def length(self, name):
+        return self.index[name][1]
+
+    def fetch(self, name, start=0, end=None):
+        """Return the sequence[start:end] of name. start and end are 0-based like a slice."""
+        offset, length = self.index[name]
+        start, end, step = slice(start, end).indices(length)
+
+        if start >= end:
+            return ''
+
+        return self.data[offset + start:offset + end].decode('ascii')
+
+    def close(self):
+        if not isinstance(self.data, bytes):
+            self.data.close()
+        self.fin.close()
+
+
+def initializer(filename):
+    """Pool initializer that opens the store of the worker."""
+    global _shared
+    _shared = seqstore(filename)
+
+
+def shared():
+    """Return the store opened by initializer in this process."""
+    if _shared is None:
+        raise RuntimeError('The sequence store is not opened. Use seqstore.initializer in the pool.')
+    return _shared
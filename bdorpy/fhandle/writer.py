@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+#
+# writer.py - Buffered writer for tab-separated rows
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# The rows are joined and kept in a buffer, and written to the file with one call when the
+# buffer is full. Flush policy:
+# * buffer_size: the number of characters buffered before they are written (default: 1 MB)
+# * flush_rows:  flush the file every NUM rows. 0 means the file is only flushed when the writer
+#                is flushed or closed. (default: 0)
+
+BUFFER_SIZE = 1024 * 1024
+
+
+class rowwriter:
+    def __init__(self, handle, buffer_size=BUFFER_SIZE, flush_rows=0):
+        self.handle = handle
+        self.buffer_size = buffer_size
+        self.flush_rows = flush_rows
+        self.buffer = []
+        self.size = 0
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.size += len(text)
+
+        if self.size >= self.buffer_size:
+            self.drain()
+
+    def write_row(self, fields):
+        self.write('\t'.join(fields) + '\n')
+        self.rows += 1
+
+        if self.flush_rows > 0 and self.rows % self.flush_rows == 0:
+            self.flush()
+
+    def drain(self):
+        """Write the buffer to the file without flushing the file."""
+        if self.buffer:
+            self.handle.write(''.join(self.buffer))
+            self.buffer = []
+            self.size = 0
+
+    def flush(self):
+        self.drain()
+        self.handle.flush()
+
+    def close(self):
+        self.flush()
+        self.handle.close()
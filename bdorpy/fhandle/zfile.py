@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+#
+# zfile.py - Open plain or compressed files
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# Supported codecs:
+# * gzip, bgzip: gzip module
+# * bzip2: bz2 module
+# * zstd: zstandard module (https://pypi.python.org/pypi/zstandard), optional
+#
+# The codec of an input file is detected by the magic bytes, and the data is decompressed on a
+# background thread. The codec of an output file is chosen by the file extension (.gz, .bgz,
+# .bz2, .zst). The bgzip output is written as a plain gzip file.
+#
+# With zopen(filename, counter=f), f(n) is called with the number of bytes of each read of the
+# input, after the decompression, e.g. counter=lambda n: proglog.count('bytes', n). It is called on
+# the thread that reads the handle, every CHUNK_SIZE bytes.
+
+import io
+import sys
+import gzip
+import bz2
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 1024 * 1024
+QUEUE_SIZE = 16
+
+MAGIC = ((b'\x1f\x8b', 'gzip'),
+         (b'BZh', 'bz2'),
+         (b'\x28\xb5\x2f\xfd', 'zstd'))
+
+EXTENSIONS = (('.gz', 'gzip'),
+              ('.bgz', 'gzip'),
+              ('.bz2', 'bz2'),
+              ('.zst', 'zstd'))
+
+LEVELS = {'gzip': 6, 'bz2': 9, 'zstd': 3}
+
+
+def detect(filename):
+    """Return the codec of the file by its magic bytes, or None for a plain file."""
+    with open(filename, 'rb') as handle:
+        head = handle.read(4)
+
+    for magic, codec in MAGIC:
+        if head.startswith(magic):
+            return codec
+
+    return None
+
+
+def codec_of_name(filename):
+    for ext, codec in EXTENSIONS:
+        if filename.endswith(ext):
+            return codec
+
+    return None
+
+
+def _check_zstd():
+    if zstandard is None:
+        raise IOError('The zstandard module is required for zstd files.')
+
+
+class threadreader(io.RawIOBase):
+    """Read a stream on a background thread. The chunks are passed through a bounded queue. An
+    error of the stream is raised by readinto, and again by every later readinto."""
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE, queue_size=QUEUE_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.chunks = queue.Queue(queue_size)
+        self.chunk = b''
+        self.eof = False
+        self.error = None
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        try:
+            while not self.stopped:
+                data = self.stream.read(self.chunk_size)
+                self.put(data)
+                if not data:
+                    break
+        except Exception as e:
+            self.put(e)
+
+    def put(self, item):
+        while not self.stopped:
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.chunk:
+            if self.error is not None:
+                raise self.error
+
+            if self.eof:
+                return 0
+
+            item = self.chunks.get()
+
+            if isinstance(item, Exception):
+                # The thread has exited after the error, and nothing more is put on the queue
+                self.error = item
+                raise item
+
+            if not item:
+                self.eof = True
+            else:
+                self.chunk = item
+
+        n = min(len(b), len(self.chunk))
+        b[:n] = self.chunk[:n]
+        self.chunk = self.chunk[n:]
+
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.stopped = True
+            self.thread.join()
+            self.stream.close()
+        io.RawIOBase.close(self)
+
+
+class countreader(io.RawIOBase):
+    """Read a stream and call counter with the number of bytes of each read."""
+
+    def __init__(self, stream, counter):
+        self.stream = stream
+        self.counter = counter
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self.stream.read(len(b))
+        n = len(data)
+        b[:n] = data
+
+        if n > 0:
+            self.counter(n)
+
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.stream.close()
+        io.RawIOBase.close(self)
+
+
+def _reader(filename, codec, threaded, counter):
+    if codec is None:
+        return io.BufferedReader(countreader(io.FileIO(filename, 'r'), counter), CHUNK_SIZE)
+
+    if codec == 'gzip':
+        stream = gzip.GzipFile(filename, 'rb')
+    elif codec == 'bz2':
+        stream = bz2.BZ2File(filename, 'rb')
+    else:
+        _check_zstd()
+        stream = zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'), read_across_frames=True,
+                                                            closefd=True)
+
+    if threaded is True:
+        stream = threadreader(stream)
+
+    if counter is not None:
+        stream = countreader(stream, counter)
+
+    if threaded is True or counter is not None:
+        stream = io.BufferedReader(stream, CHUNK_SIZE)
+
+    return stream
+
+
+def _writer(filename, codec, level):
+    if level is None:
+        level = LEVELS[codec]
+
+    if codec == 'gzip':
+        return gzip.GzipFile(filename, 'wb', compresslevel=level)
+    elif codec == 'bz2':
+        return bz2.BZ2File(filename, 'wb', compresslevel=level)
+    else:
+        _check_zstd()
+        return zstandard.ZstdCompressor(level=level).stream_writer(open(filename, 'wb'), closefd=True)
+
+
+def zopen(filename, mode='r', level=None, threaded=True, counter=None):
+    """Open a plain or compressed file.
+
+    mode: 'r', 'rb', 'w' or 'wb'. The 'r' and 'w' modes return text handles.
+    level: compression level of the output. The default of the codec is used if it is None.
+    threaded: decompress the input on a background thread.
+    counter: a function called with the number of bytes of each read of the input.
+    """
+    if 'r' in mode:
+        codec = detect(filename)
+    else:
+        codec = codec_of_name(filename)
+
+    if codec is None and (counter is None or 'r' not in mode):
+        return open(filename, mode)
+
+    if 'r' in mode:
+        handle = _reader(filename, codec, threaded, counter)
+    else:
+        handle = _writer(filename, codec, level)
+
+    if 'b' in mode or sys.version_info[0] < 3:
+        return handle
+
+    return io.TextIOWrapper(handle)
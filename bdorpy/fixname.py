@@ -15,46 +15,53 @@
 # Options:
 # -o, --output STR: output file name. If this option is not specified, the script will generate
 #                   one with unique identifier at current directory.
+# --progress   NUM: write a progress line to stderr every NUM seconds. 0 means no progress lines.
+#                   (default: 0)
+# --metrics    STR: write the stage times, counters and rates to a JSON file at exit
 #
 # This script replace the hit name generated with makeblastdb tool with NCBI accession name.
 
 import sys
 import argparse
 import re
-from fhandle import name
+from fhandle import name, writer, blastlist, logmsg
 
 
 def main():
+    proglog = logmsg.message(prog='fixname', cmd=' '.join(sys.argv))
+
     parser = argparse.ArgumentParser(description='fixname - Fix hit name in the blastlist')
     parser.add_argument('input_file')
     parser.add_argument('-o', '--output', dest='output_file',
                         help='output file name. If this option is not specified, the script will generate '
                         'one with unique identifier at current directory.')
+    logmsg.add_arguments(parser)
     args = parser.parse_args()
+    proglog.setup(args.progress, args.metrics)
 
     if args.output_file is None:
         args.output_file = args.input_file + '_out_' + name.genid() + '.fix'
 
     hitname = re.compile('.*?(gi\|\d*?\|.*?\|.*?\|)(.*)')
 
-    with open(args.input_file, 'r') as fin, open(args.output_file, 'w') as fw:
+    with open(args.input_file, 'r') as fin, writer.rowwriter(open(args.output_file, 'w')) as fw, \
+            proglog.stage('fix'):
         for linum, line in enumerate(fin, start=1):
-            if line.lstrip() == '' or line.lstrip()[0] in ('#', 'a'):
+            if not blastlist.is_record(line):
                 fw.write(line)
-                fw.flush()
             else:
-                data = line.split('\t')
-                match = hitname.match(data[26])
+                rec = blastlist.record(line)
+                proglog.count('hsps')
+                match = hitname.match(rec.hit_description)
 
                 if match is None:
                     print('No mathced name in line ' + str(linum) + '.')
                     print('Please have a check.')
                     sys.exit()
                 else:
-                    data[4] = match.group(1)
-                    data[26] = match.group(1) + match.group(2) + '\n'
-                    fw.write('\t'.join(data))
-                    fw.flush()
+                    rec.data[blastlist.INDEX['hit_name']] = match.group(1)
+                    rec.data[blastlist.INDEX['hit_description']] = match.group(1) + match.group(2)
+                    fw.write_row(rec.data)
 
 if __name__ == '__main__':
     main()
@@ -13,10 +13,12 @@
 # Usage: idfix.py <idmap> <fasta> <output>
 
 import sys
+from fhandle import writer, zfile
 
 
 def main():
-    with open(sys.argv[1], 'r') as fin, open(sys.argv[2], 'r') as ffa, open(sys.argv[3], 'w') as fo:
+    with zfile.zopen(sys.argv[1], 'r') as fin, zfile.zopen(sys.argv[2], 'r') as ffa, \
+            writer.rowwriter(open(sys.argv[3], 'w')) as fo:
         full_id = {}
 
         for line in ffa:
@@ -26,8 +28,7 @@ def main():
 
         for line in fin:
             if line.split('\t')[1].rstrip() in full_id:
-                fo.write(line.split('\t')[0] + '\t' + full_id[line.split('\t')[1].rstrip()] + '\n')
-                fo.flush()
+                fo.write_row([line.split('\t')[0], full_id[line.split('\t')[1].rstrip()]])
             else:
                 sys.exit('Id not found, stop!')
 
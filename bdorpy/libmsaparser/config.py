@@ -10,6 +10,7 @@
 
 import configparser
 import argparse
+from fhandle import logmsg
 
 
 def get_configuration(root_dir):
@@ -23,7 +24,7 @@ def define_and_parse_options(filename):
     config.read(filename)
     parser = argparse.ArgumentParser()
     parser.add_argument('-s', '--source-directory', dest='source_directory', required=True,
-                        help='the path MSA files stored')
+                        help='the path MSA files stored, or a pack of the MSA files (see msapack)')
     parser.add_argument('-o', '--output-directory', dest='output_directory', required=True,
                         help='the path output files stored')
     parser.add_argument('-Q', '--query-species', dest='assembly',
@@ -44,6 +45,7 @@ def define_and_parse_options(filename):
                         help='the +- range for checking star number (default: 5)')
     parser.add_argument('-p', dest='process_num', type=int, default=1,
                         help='number of threads (CPUs) to use (default: 1)')
+    logmsg.add_arguments(parser)
     return parser.parse_args()
 
 
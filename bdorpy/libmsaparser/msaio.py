@@ -8,7 +8,12 @@
 #
 # Author: Jian-Long Huang (jianlong@ntu.edu.tw)
 
+import io
 import os
+from fhandle import pack
+
+# The opened packs, by process ID and file name. Each worker process opens its own file.
+_packs = {}
 
 
 class FileInput:
@@ -22,3 +27,27 @@ class FileInput:
 
     def get_files(self):
         return self.files
+
+
+class PackInput:
+    """ Input MSA files in a pack (fhandle.pack)"""
+
+    def __init__(self, filename):
+        self.files = [(filename, name) for name in get_pack(filename)]
+
+    def get_files(self):
+        return self.files
+
+
+def get_pack(filename):
+    key = (os.getpid(), filename)
+    if key not in _packs:
+        _packs[key] = pack.packreader(filename)
+    return _packs[key]
+
+
+def open_msa(root, filename):
+    """Open the MSA file of FileInput or PackInput. root is the directory or the pack."""
+    if pack.is_pack(root):
+        return io.StringIO(get_pack(root).read(filename), newline=None)
+    return open(root + "/" + filename, 'r')
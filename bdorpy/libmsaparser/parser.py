@@ -8,10 +8,12 @@
 #
 # Author: Jian-Long Huang (jianlong@ntu.edu.tw)
 
+import os
 import re
 import sys
 from libmsaparser import sequence
 from libmsaparser import converter
+from libmsaparser import msaio
 
 
 def writeheader(handle):
@@ -33,6 +35,39 @@ def writeheader(handle):
     handle.flush()
 
 
+class GroupClassifier:
+    """ Classify the lines of the Susp, Res and Rec groups with one compiled regex"""
+
+    def __init__(self, susplist, reslist, reclist):
+        # Each group is a lookahead from the beginning of the line, so the groups are tried in
+        # the order Susp, Res, Rec, the same as searching the patterns of each group in turn
+        alternatives = []
+
+        for group, patterns in (('susp', susplist), ('res', reslist), ('rec', reclist)):
+            alternatives.append('(?P<' + group + r'>(?=[\s\S]*?(?:' +
+                                '|'.join('(?:' + pattern + ')' for pattern in patterns) + ')))')
+
+        self.regex = re.compile('|'.join(alternatives))
+
+    def classify(self, line):
+        """ Return 'susp', 'res', 'rec' or None"""
+        match = self.regex.match(line)
+        if match is None:
+            return None
+        return match.lastgroup
+
+
+# Classifiers compiled in this process, by the group patterns
+_classifiers = {}
+
+
+def get_classifier(susplist, reslist, reclist):
+    key = (tuple(susplist), tuple(reslist), tuple(reclist))
+    if key not in _classifiers:
+        _classifiers[key] = GroupClassifier(susplist, reslist, reclist)
+    return _classifiers[key]
+
+
 class Parser:
 
     def __init__(self,
@@ -51,33 +86,47 @@ class Parser:
         self.star = sequence.Star()
         self.groups = [self.susp, self.res, self.rec]
         self.hit_src_name = reference
-        match = re.match(r'(.+).clu', filename)
+        # The files in a pack may be named with the subdirectory
+        match = re.match(r'(.+).clu', os.path.basename(filename))
         if match is None:
             sys.exit("Error! The filename '" + filename + "' is not correct.")
         else:
             self.hit_name = match.group(1)
 
-        for line in open(root + "/" + filename, 'r'):
-            if re.search(r'CLUSTAL', line):
+        classifier = get_classifier(susplist, reslist, reclist)
+        groups = {'susp': self.susp, 'res': self.res, 'rec': self.rec}
+        # Group of each sequence name, classified at its first line in the file
+        name_groups = {}
+
+        for line in msaio.open_msa(root, filename):
+            if 'CLUSTAL' in line:
                 self.clutitle.read(line)
                 self.order.append(self.clutitle)
-                if re.search(r'MAFFT', line):
+                if 'MAFFT' in line:
                     self.msa_method = 'MAFFT'
                 else:
                     self.msa_method = 'CLUSTAL'
-            elif re.search(r'^\n', line):
+                continue
+            elif line[:1] == '\n':
                 self.space.read(line)
                 self.order.append(self.space)
-            elif any(re.search(grpsusp, line) for grpsusp in susplist):
-                self.susp.read(line)
-                self.order.append(self.susp)
-            elif any(re.search(grpres, line) for grpres in reslist):
-                self.res.read(line)
-                self.order.append(self.res)
-            elif any(re.search(grprec, line) for grprec in reclist):
-                self.rec.read(line)
-                self.order.append(self.rec)
-            elif re.search(r'^\s', line):
+                continue
+
+            if line[:1].isspace():
+                # The star lines have no sequence name
+                group = classifier.classify(line)
+            else:
+                name = line.split(None, 1)[0]
+
+                if name in name_groups:
+                    group = name_groups[name]
+                else:
+                    group = name_groups[name] = classifier.classify(line)
+
+            if group is not None:
+                groups[group].read(line)
+                self.order.append(groups[group])
+            elif line[:1].isspace():
                 self.star.read(line, self.susp.clulen)
                 self.order.append(self.star)
             else:
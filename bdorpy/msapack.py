@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+#
+# msapack - Pack MSA input or output files into one container, or extract them
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# Usage: msapack <directory|file.pack> [options]
+#
+# Options:
+# -o, --output STR: output name. If the input is a directory, it is the pack to write (default:
+#                   <directory>.pack). If the input is a pack, it is the directory the files are
+#                   extracted to (default: the pack name without .pack).
+# -l, --list      : list the files in the pack instead of extracting them (default: false)
+# --progress   NUM: write a progress line to stderr every NUM seconds. 0 means no progress lines.
+#                   (default: 0)
+# --metrics    STR: write the stage times, counters and rates to a JSON file at exit
+#
+# File formats:
+# * pack: fhandle.pack, <file.pack> and the index <file.pack>.idx
+#
+# For example:
+# * commonfa -b <a.blastlist> <b.blastlist> -f <a.fa> <b.fa> -o out -P
+# * msapack out/msainput.pack -o out/msainput     (the fasta files for the external aligner)
+# * msapack clu_dir -o clu.pack
+# * msaparser -s clu.pack -o msap_out
+
+import os
+import sys
+import argparse
+from fhandle import pack, logmsg
+
+
+def main():
+    proglog = logmsg.message(prog='msapack', cmd=' '.join(sys.argv))
+
+    parser = argparse.ArgumentParser(description='msapack - Pack MSA input or output files into one container, '
+                                     'or extract them')
+    parser.add_argument('input')
+    parser.add_argument('-o', '--output', dest='output',
+                        help='output name. If the input is a directory, it is the pack to write (default: '
+                        '<directory>.pack). If the input is a pack, it is the directory the files are extracted '
+                        'to (default: the pack name without .pack).')
+    parser.add_argument('-l', '--list', dest='list', action='store_true', default=False,
+                        help='list the files in the pack instead of extracting them (default: false)')
+    logmsg.add_arguments(parser)
+    args = parser.parse_args()
+    proglog.setup(args.progress, args.metrics)
+    args.input = args.input.rstrip('/')
+
+    if os.path.isdir(args.input):
+        if args.output is None:
+            args.output = args.input + '.pack'
+
+        with proglog.stage('pack'):
+            number = pack.pack(args.input, args.output, counter=lambda n: proglog.count('files', n))
+
+        sys.stderr.write('# Packed files: ' + str(number) + '\n')
+    elif pack.is_pack(args.input):
+        if args.list is True:
+            with pack.packreader(args.input) as fin:
+                for name in fin:
+                    sys.stdout.write(name + '\n')
+            return
+
+        if args.output is None:
+            if args.input.endswith('.pack'):
+                args.output = args.input[:-len('.pack')]
+            else:
+                args.output = args.input + '_files'
+
+        with proglog.stage('extract'):
+            number = pack.explode(args.input, args.output, counter=lambda n: proglog.count('files', n))
+
+        sys.stderr.write('# Extracted files: ' + str(number) + '\n')
+    else:
+        parser.error(args.input + ' is neither a directory nor a pack')
+
+if __name__ == '__main__':
+    main()
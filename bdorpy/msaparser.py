@@ -15,7 +15,8 @@
 # Usage: msaparser -s <source_dir> -o <output_dir> [options]
 #
 # Options:
-# -s, --source-directory      STR: the path MSA files stored (required)
+# -s, --source-directory      STR: the path MSA files stored, or a pack of the MSA files (see msapack)
+#                                  (required)
 # -o, --output-directory      STR: the path output files sotred (required)
 # -Q, --query-species         STR: the synonym of species name of aligned sequences
 #                                  (e.g. For Bactrocera dorsalis, the synonym is 'bdor')
@@ -24,9 +25,13 @@
 # -L, --block-length          NUM: block length (default: 10)
 # -C, --star-checknumber      NUM: the +- range for checking star number (default: 5)
 # -p, --process               NUM: number of threads (CPUs) to use (default: 1)
+# --progress                  NUM: write a progress line to stderr every NUM seconds. 0 means no
+#                                  progress lines. (default: 0)
+# --metrics                   STR: write the stage times, counters and rates to a JSON file at exit
 #
 # Formats:
 # files in <source_dir>: clustal
+# <source_dir>.pack: clustal files in a container (fhandle.pack)
 # output: msap, html
 
 
@@ -76,6 +81,7 @@ def main():
     proglog = logmsg.message(prog='msaparser', cmd=' '.join(sys.argv))
 
     options, opt_others = config.get_configuration(os.path.dirname(os.path.abspath(__file__)))
+    proglog.setup(options.progress, options.metrics)
     options.output_directory = options.output_directory.rstrip('/')
     options.source_directory = options.source_directory.rstrip('/')
 
@@ -91,7 +97,10 @@ def main():
         fw.flush()
         parser.writeheader(fw)
 
-    cluinput = msaio.FileInput(options.source_directory)
+    if os.path.isfile(options.source_directory):
+        cluinput = msaio.PackInput(options.source_directory)
+    else:
+        cluinput = msaio.FileInput(options.source_directory)
 
     proc_manager = Manager()
     q_write = proc_manager.Queue()
@@ -110,8 +119,12 @@ def main():
         for root, filename in files:
             tasks.append((root, filename, options, opt_others, q_write))
 
-        proc.starmap(begin_parse, tasks)
-        write_result(q_write, options.output_directory, mainfile)
+        with proglog.stage('parse'):
+            proc.starmap(begin_parse, tasks)
+            proglog.count('files', len(tasks))
+
+        with proglog.stage('write'):
+            write_result(q_write, options.output_directory, mainfile)
 
     with open(mainfile, 'a') as fw:
         fw.write('\n')
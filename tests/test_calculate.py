@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+#
+# test_calculate.py - Tests of alignment.calculate
+#
+# Copyright (C) 2013, Jian-Long Huang
+# Licensed under The MIT License
+# http://opensource.org/licenses/MIT
+#
+# Author: Jian-Long Huang (jianlong@ntu.edu.tw)
+#
+# Usage: python -m pytest tests, or python -m unittest discover tests
+
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bdorpy'))
+
+from alignment import calculate
+
+
+def get_non_overlap_chain_pairwise(positions, ranks):
+    """Return the chain of the pairwise loop that get_non_overlap_chain replaces in blastnol, which
+    compares the chain with the next position and pops it from the list. It is quadratic, and is
+    the reference of get_non_overlap_chain."""
+    hits = [[i] for i in sorted(range(len(positions)), key=lambda i: positions[i][0])]
+
+    while len(hits) > 1:
+        position = calculate.get_non_overlap((positions[hits[0][0]][0], positions[hits[0][-1]][1]),
+                                             positions[hits[1][0]])
+        if position is not None:
+            # The two sequences are non-overlapping, combine them
+            hits[0] = hits[0] + hits[1]
+            hits.pop(1)
+        else:
+            # Compare the hit rank to determine which one is retained
+            if ranks[hits[0][-1]] < ranks[hits[1][0]]:
+                # Discard the next hit
+                hits.pop(1)
+            else:
+                # Discard the last hit, and join the next hit
+                hits[0].pop(-1)
+                hits[0] = hits[0] + hits[1]
+                hits.pop(1)
+
+    if len(hits) == 0:
+        return []
+
+    return hits[0]
+
+
+def random_positions(rand, size, length):
+    positions = []
+
+    for i in range(size):
+        if positions and rand.random() < 0.3:
+            # A position contained in, or with the same start as, an earlier one
+            start, end = rand.choice(positions)
+            new_start = rand.randint(start, end)
+            positions.append((new_start, rand.randint(new_start, end)))
+        else:
+            start = rand.randint(1, length)
+            positions.append((start, start + rand.randint(0, length // 4)))
+
+    return positions
+
+
+class NonOverlapChainTest(unittest.TestCase):
+    def assert_same_chain(self, positions, ranks):
+        self.assertEqual(calculate.get_non_overlap_chain(positions, ranks),
+                         get_non_overlap_chain_pairwise(positions, ranks),
+                         'positions: ' + str(positions) + ', ranks: ' + str(ranks))
+
+    def test_empty_and_single(self):
+        self.assert_same_chain([], [])
+        self.assert_same_chain([(5, 10)], [1])
+
+    def test_examples(self):
+        # Non-overlapping
+        self.assert_same_chain([(1, 10), (20, 30), (40, 50)], [3, 1, 2])
+        # The better ranked position is kept
+        self.assert_same_chain([(1, 10), (5, 30)], [2, 1])
+        self.assert_same_chain([(1, 10), (5, 30)], [1, 2])
+        # Contained, touching and equal positions
+        self.assert_same_chain([(1, 100), (10, 20), (30, 40)], [2, 1, 3])
+        self.assert_same_chain([(1, 10), (10, 20)], [1, 2])
+        self.assert_same_chain([(1, 10), (1, 10), (1, 10)], [1, 1, 1])
+
+    def test_random_hit_ranks(self):
+        rand = random.Random(20130208)
+
+        for trial in range(2000):
+            positions = random_positions(rand, rand.randint(0, 30), 500)
+            ranks = list(range(1, len(positions) + 1))
+            rand.shuffle(ranks)
+            self.assert_same_chain(positions, ranks)
+
+    def test_random_rank_ties(self):
+        rand = random.Random(20130209)
+
+        for trial in range(2000):
+            positions = random_positions(rand, rand.randint(0, 30), 200)
+            ranks = [rand.randint(1, 4) for i in positions]
+            self.assert_same_chain(positions, ranks)
+
+
+@unittest.skipIf(calculate.numpy is None, 'NumPy is required by the batch interval functions')
+class IntervalBatchTest(unittest.TestCase):
+    def assert_intervals(self, intervals, expected):
+        self.assertEqual([tuple(interval) for interval in intervals.tolist()], expected)
+
+    def test_overlap_against_scalar(self):
+        rand = random.Random(20130210)
+        # Shared endpoints, equal and contained intervals
+        first = [(1, 10), (10, 20), (1, 10), (5, 6), (1, 100), (20, 30)]
+        second = [(10, 20), (1, 10), (1, 10), (1, 10), (10, 20), (1, 19)]
+
+        for trial in range(500):
+            start = rand.randint(1, 50)
+            first.append((start, start + rand.randint(0, 20)))
+            start = rand.randint(1, 50)
+            second.append((start, start + rand.randint(0, 20)))
+
+        overlap = calculate.is_overlap(first, second).tolist()
+        non_overlap = calculate.is_non_overlap(first, second).tolist()
+
+        for i in range(len(first)):
+            self.assertEqual(overlap[i], calculate.get_overlap(first[i], second[i]) is not None,
+                             str((first[i], second[i])))
+            self.assertEqual(non_overlap[i], calculate.get_non_overlap(first[i], second[i]) is not None,
+                             str((first[i], second[i])))
+
+        # Intervals sharing an endpoint are neither overlapping nor non-overlapping
+        self.assertEqual(overlap[:2], [False, False])
+        self.assertEqual(non_overlap[:2], [False, False])
+
+    def test_spans(self):
+        self.assert_intervals(calculate.get_spans([(1, 10), (30, 40)], [(5, 20), (1, 2)]), [(1, 20), (1, 40)])
+
+    def test_normalize(self):
+        # The reversed intervals of the minus strand are swapped
+        self.assert_intervals(calculate.normalize([(10, 1), (3, 5), (7, 7)]), [(1, 10), (3, 5), (7, 7)])
+        self.assert_intervals(calculate.normalize([]), [])
+
+    def test_merge_intervals(self):
+        self.assert_intervals(calculate.merge_intervals([]), [])
+        # Adjacent intervals are merged, separated ones are not
+        self.assert_intervals(calculate.merge_intervals([(1, 10), (11, 20)]), [(1, 20)])
+        self.assert_intervals(calculate.merge_intervals([(1, 10), (12, 20)]), [(1, 10), (12, 20)])
+        # Overlapping, contained, reversed and unsorted intervals
+        self.assert_intervals(calculate.merge_intervals([(30, 25), (5, 15), (1, 10), (2, 3), (40, 50)]),
+                              [(1, 15), (25, 30), (40, 50)])
+
+    def test_covered_length(self):
+        self.assertEqual(calculate.covered_length([]), 0)
+        self.assertEqual(calculate.covered_length([(1, 10), (5, 15), (20, 20)]), 16)
+
+    def test_gaps(self):
+        self.assert_intervals(calculate.get_gaps([], 1, 100), [(1, 100)])
+        self.assert_intervals(calculate.get_gaps([(1, 100)], 1, 100), [])
+        # Adjacent intervals leave no gap between them
+        self.assert_intervals(calculate.get_gaps([(1, 10), (11, 20)], 1, 30), [(21, 30)])
+        self.assert_intervals(calculate.get_gaps([(5, 10), (21, 25)], 1, 30), [(1, 4), (11, 20), (26, 30)])
+        # Intervals outside start..end
+        self.assert_intervals(calculate.get_gaps([(1, 5), (50, 60)], 10, 40), [(10, 40)])
+
+    def test_covers(self):
+        positions = [(10, 20), (30, 40)]
+        # Points before the first interval, at the endpoints, between and after the intervals
+        self.assertEqual(calculate.covers(positions, [1, 9, 10, 20, 21, 30, 40, 41]).tolist(),
+                         [False, False, True, True, False, True, True, False])
+        self.assertEqual(calculate.covers([], [1, 2]).tolist(), [False, False])
+
+    def test_is_contained(self):
+        self.assertEqual(calculate.is_contained([(5, 10), (10, 5), (1, 10), (0, 5)],
+                                                [(1, 10), (1, 10), (10, 1), (1, 10)]).tolist(),
+                         [True, True, True, False])
+
+    def test_random_against_sets(self):
+        rand = random.Random(20130211)
+
+        for trial in range(300):
+            positions = [tuple(rand.sample(range(1, 80), 2)) for i in range(rand.randint(0, 8))]
+            covered = set()
+
+            for start, end in positions:
+                covered.update(range(min(start, end), max(start, end) + 1))
+
+            self.assertEqual(calculate.covered_length(positions), len(covered))
+            self.assertEqual(calculate.covers(positions, range(0, 90)).tolist(),
+                             [point in covered for point in range(0, 90)])
+            gaps = set()
+
+            for start, end in calculate.get_gaps(positions, 1, 80).tolist():
+                gaps.update(range(start, end + 1))
+
+            self.assertEqual(gaps, set(range(1, 81)) - covered)
+
+if __name__ == '__main__':
+    unittest.main()